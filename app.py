@@ -19,7 +19,6 @@ import re
 from datetime import datetime
 from functools import wraps
 import pytz
-import pandas as pd
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
@@ -48,8 +47,10 @@ ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "12")
 try:
     from utils_def_1 import (
         driver, NEO4J_DATABASE, get_mistral_client, mistral_request,
-        MISTRAL_MODEL, MISTRAL_API_KEY, embedding_model, EMBED_DIM
+        MISTRAL_MODEL, MISTRAL_API_KEY, get_embedding_model
     )
+    # Load the encoder at worker start rather than on the first chat request
+    get_embedding_model()
 except ImportError as e:
     print(f"Warning: Could not import utilities: {e}")
     driver = None
@@ -60,13 +61,15 @@ try:
     from util_func_1 import (
         process_user_query, generate_response, SlidingWindowMemory,
         save_chat_message, load_chat_history, clear_chat_history,
-        get_user_profile, save_user_profile, save_marks, get_user_marks,
+        get_user_profile, save_user_profile, save_user_profile_bulk,
+        save_marks, get_user_marks,
         delete_mark, update_mark, update_marks_completed,
         get_user_riasec_results, save_riasec_results, calculate_riasec_scores,
         get_trait_name, get_riasec_trait_description, get_user_playlist,
         add_to_playlist, remove_from_playlist, get_playlist_count,
         extract_all_course_properties, format_course_for_display,
-        format_courses_for_chat_response, save_user_semester
+        format_courses_for_chat_response, save_user_semester,
+        forget_display_name
     )
 except ImportError as e:
     print(f"Warning: Could not import functions: {e}")
@@ -190,6 +193,7 @@ def login():
             if result and check_password_hash(result["password"], password):
                 session['username'] = username
                 session['logged_in'] = True
+                forget_display_name(username)
                 
                 marks_completed = result.get("marks_completed", False)
                 riasec_completed = result.get("riasec_completed", False)
@@ -584,28 +588,22 @@ def send_chat():
         # Save user message to database
         save_chat_message(username, "user", user_input)
         
-        input_lower = user_input.lower()
-        is_prereq_query = any(term in input_lower for term in [
-            'prerequisite', 'prereq', 'pre-req', 'dependency', 'require', 'before', 'pre reqs', 'pre recs'
-        ])
-        is_postreq_query = any(term in input_lower for term in [
-            'postrequisite', 'postreq', 'post-req', 'leads to', 'next', 'after', 'post recs', 'post reqs', 'post req'
-        ])
-        is_pathway_query = any(term in input_lower for term in [
-            'pathway', 'learning path', 'study path', 'progression', 'roadmap', 'journey', 'complete path', 'full path'
-        ])
-        
-        query_results = process_user_query(driver, user_input, username)
+        client = get_mistral_client(MISTRAL_API_KEY) if MISTRAL_API_KEY else None
+        
+        # The RIASEC profile only feeds the Mistral prompt; skip reading it without a client
+        query_results = process_user_query(driver, user_input, username, load_profile=client is not None)
         tree = query_results.get('ascii_tree') if query_results else None
         
-        if (is_prereq_query or is_postreq_query or is_pathway_query) and tree:
+        # Use the same intent classification that decided whether to build the tree
+        intents = query_results.get('query_intents', set()) if query_results else set()
+        wants_tree = bool(intents & {'prereq', 'postreq', 'pathway'})
+        
+        if wants_tree and tree:
             save_chat_message(username, "assistant", tree, is_code=True)
             send_tree = tree
         else:
             send_tree = None
         
-        client = get_mistral_client(MISTRAL_API_KEY) if MISTRAL_API_KEY else None
-        
         # Load full chat history from database
         chat_history = load_chat_history(username) or []
         
@@ -776,22 +774,16 @@ def update_profile():
         bio = request.form.get('bio', '').strip()
         current_semester = request.form.get('current_semester', '').strip()
         
-        success = True
-        if display_name:
-            result = save_user_profile(username, 'display_name', display_name)
-            success = success and result
-        if email:
-            result = save_user_profile(username, 'email', email)
-            success = success and result
-        if phone:
-            result = save_user_profile(username, 'phone', phone)
-            success = success and result
-        if location:
-            result = save_user_profile(username, 'location', location)
-            success = success and result
-        if bio:
-            result = save_user_profile(username, 'bio', bio)
-            success = success and result
+        updates = {
+            'display_name': display_name,
+            'email': email,
+            'phone': phone,
+            'location': location,
+            'bio': bio
+        }
+        updates = {field: value for field, value in updates.items() if value}
+        
+        success = save_user_profile_bulk(username, updates)
         if current_semester:
             result = save_user_semester(username, current_semester)
             success = success and result
@@ -0,0 +1,46 @@
+"""
+Script to link courses to their RIASEC Trait nodes in Neo4j
+Run this after loading or changing course data
+"""
+
+from utils_def_1 import driver, NEO4J_DATABASE
+
+# Mirror each course's non-zero RIASEC scores as (:Course)-[:HAS_TRAIT {score}]->(:Trait)
+# so trait lookups seek the Trait.name constraint instead of scanning every Course
+TRAIT_SYNC_STATEMENTS = (
+    "UNWIND ['R', 'I', 'A', 'S', 'E', 'C'] AS name MERGE (:Trait {name: name})",
+    """
+    MATCH (t:Trait)
+    MATCH (c:Course) WHERE c[t.name] > 0
+    MERGE (c)-[r:HAS_TRAIT]->(t)
+    SET r.score = c[t.name]
+    """,
+    """
+    MATCH (c:Course)-[r:HAS_TRAIT]->(t:Trait)
+    WHERE NOT coalesce(c[t.name], 0) > 0
+    DELETE r
+    """,
+)
+
+def sync_course_traits():
+    """Rebuild HAS_TRAIT edges from course RIASEC scores"""
+    if not driver:
+        print("❌ Error: Database connection failed!")
+        return False
+
+    def sync(tx):
+        for statement in TRAIT_SYNC_STATEMENTS:
+            tx.run(statement).consume()
+
+    try:
+        with driver.session(database=NEO4J_DATABASE) as s:
+            # One retried write transaction: all-or-nothing, and transient deadlocks are retried
+            s.execute_write(sync)
+        print("✅ Course trait links updated!")
+        return True
+    except Exception as e:
+        print(f"❌ Error syncing course traits: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    sync_course_traits()
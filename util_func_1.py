@@ -6,16 +6,36 @@ ENHANCED VERSION: Playlist, Semester, and Career Planning Features
 import json
 import os
 import re
+import threading
 import uuid
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from heapq import nlargest
+from itertools import islice
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
+from cachetools import TTLCache
 import pytz
 from datetime import datetime
-from neo4j import GraphDatabase
-import pandas as pd
+from neo4j import GraphDatabase, Result, RoutingControl
+
+# Optional: Aho-Corasick automaton for query term classification
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Optional HNSW index for the semantic search result cache (pip install hnswlib;
+# not in requirements.txt since it ships no wheels and the build is binary-only)
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
 
 from utils_def_1 import (
-    embedding_model, run_read_cypher, mistral_request, 
+    get_embedding_model, get_embedding_batcher, run_read_cypher, mistral_request,
     MISTRAL_MODEL, driver, MISTRAL_API_KEY, get_mistral_client,
     NEO4J_DATABASE
 )
@@ -31,6 +51,11 @@ COURSE_PROPERTIES = [
     'R', 'I', 'A', 'S', 'E', 'C', 'recommended_semester'
 ]
 
+# Profile fields users may edit through save_user_profile / save_user_profile_bulk
+PROFILE_FIELDS = frozenset({
+    'email', 'display_name', 'bio', 'location', 'phone', 'profile_picture'
+})
+
 # ============================================================================
 # DATABASE HELPER FUNCTIONS
 # ============================================================================
@@ -40,8 +65,6 @@ def save_chat_message(username, role, content, is_code=False):
     if not driver:
         return None
     try:
-        india_tz = pytz.timezone("Asia/Kolkata")
-        now_india = datetime.now(india_tz).isoformat()
         with driver.session(database=NEO4J_DATABASE) as s:
             result = s.run("""
                 MATCH (u:User {username: $username})
@@ -50,18 +73,55 @@ def save_chat_message(username, role, content, is_code=False):
                     role: $role,
                     content: $content,
                     is_code: $is_code,
-                    timestamp: datetime($timestamp)
+                    timestamp: datetime({timezone: 'Asia/Kolkata'})
                 })
                 CREATE (u)-[:HAS_MESSAGE]->(m)
                 RETURN m.timestamp AS timestamp  
             """, username=username, msg_id=str(uuid.uuid4()),
-                       role=role, content=content, is_code=is_code,
-                       timestamp=now_india).single()
+                       role=role, content=content, is_code=is_code).single()
             return result["timestamp"] if result else None
     except Exception as e:
         print(f"Failed to save message: {e}")
         return None
 
+def save_chat_messages_bulk(username, rows, batch_size=1000):
+    """Save many chat messages to Neo4j with one UNWIND query per batch"""
+    if not driver:
+        return 0
+    # seq keeps untimestamped rows in input order: they all share one statement clock
+    rows = [{
+        'id': str(uuid.uuid4()),
+        'seq': seq,
+        'role': row['role'],
+        'content': row['content'],
+        'is_code': bool(row.get('is_code', False)),
+        'timestamp': row.get('timestamp')
+    } for seq, row in enumerate(rows)]
+    saved = 0
+    try:
+        with driver.session(database=NEO4J_DATABASE) as s:
+            for start in range(0, len(rows), batch_size):
+                result = s.run("""
+                    MATCH (u:User {username: $username})
+                    UNWIND $rows AS r
+                    CREATE (m:ChatMessage {
+                        id: r.id,
+                        role: r.role,
+                        content: r.content,
+                        is_code: r.is_code,
+                        timestamp: CASE WHEN r.timestamp IS NULL
+                                        THEN datetime({timezone: 'Asia/Kolkata'}) + duration({milliseconds: r.seq})
+                                        ELSE datetime(r.timestamp) END
+                    })
+                    CREATE (u)-[:HAS_MESSAGE]->(m)
+                    RETURN count(m) AS saved
+                """, username=username, rows=rows[start:start + batch_size]).single()
+                saved += result["saved"] if result else 0
+        return saved
+    except Exception as e:
+        print(f"Failed to save messages in bulk: {e}")
+        return saved
+
 def load_chat_history(username):
     """Load chat history from Neo4j"""
     if not driver:
@@ -101,6 +161,7 @@ def clear_chat_history(username):
                 MATCH (u:User {username: $username})-[:HAS_MESSAGE]->(m:ChatMessage)
                 DETACH DELETE m
             """, username=username)
+        _chat_memory.forget(username)
     except Exception as e:
         print(f"Failed to clear chat history: {e}")
 
@@ -137,21 +198,56 @@ def get_user_profile(username):
         print(f"Error loading profile: {e}")
         return None
 
-def save_user_profile(username, field, value):
-    """Save user profile information to Neo4j"""
+# Per-process cache: the TTL bounds how long other workers can serve a renamed user's old name
+_DISPLAY_NAME_CACHE = TTLCache(maxsize=4096, ttl=300)
+_DISPLAY_NAME_CACHE_LOCK = threading.Lock()
+
+def _get_display_name(username):
+    """Fetch a user's display name, cached for a few minutes"""
+    with _DISPLAY_NAME_CACHE_LOCK:
+        if username in _DISPLAY_NAME_CACHE:
+            return _DISPLAY_NAME_CACHE[username]
+    records, _, _ = driver.execute_query("""
+        MATCH (u:User {username: $username})
+        RETURN u.display_name AS display_name
+    """, username=username, database_=NEO4J_DATABASE, routing_=RoutingControl.READ)
+    display_name = records[0]["display_name"] if records else None
+    with _DISPLAY_NAME_CACHE_LOCK:
+        _DISPLAY_NAME_CACHE[username] = display_name
+    return display_name
+
+def forget_display_name(username):
+    """Drop a user's cached display name (after a rename or on login)"""
+    with _DISPLAY_NAME_CACHE_LOCK:
+        _DISPLAY_NAME_CACHE.pop(username, None)
+
+def save_user_profile_bulk(username, props: Dict[str, Any]):
+    """Save several user profile fields to Neo4j in one query"""
     if not driver:
         return False
+    invalid = set(props) - PROFILE_FIELDS
+    if invalid:
+        print(f"Error saving profile: unsupported fields {sorted(invalid)}")
+        return False
+    if not props:
+        return True
     try:
         with driver.session(database=NEO4J_DATABASE) as s:
-            s.run(f"""
-                MATCH (u:User {{username: $username}})
-                SET u.{field} = $value
-            """, username=username, value=value)
+            s.run("""
+                MATCH (u:User {username: $username})
+                SET u += $props
+            """, username=username, props=props)
+        if 'display_name' in props:
+            forget_display_name(username)
         return True
     except Exception as e:
         print(f"Error saving profile: {e}")
         return False
 
+def save_user_profile(username, field, value):
+    """Save user profile information to Neo4j"""
+    return save_user_profile_bulk(username, {field: value})
+
 def save_user_semester(username, semester):
     """Save user's current semester selection"""
     if not driver:
@@ -283,6 +379,10 @@ def save_riasec_results(username, answers, riasec_results):
     if not driver:
         return False
     
+    # Store a unit-length vector so cosine similarity against it is a plain dot product
+    vector = np.asarray(riasec_results['riasec_vector'], dtype=np.float32)
+    vector = vector / (np.linalg.norm(vector) + 1e-12)
+
     try:
         with driver.session(database=NEO4J_DATABASE) as s:
             s.run("""
@@ -298,7 +398,7 @@ def save_riasec_results(username, answers, riasec_results):
             answers=json.dumps(answers),
             scores=json.dumps(riasec_results['scores']),
             top3=riasec_results['top3'],
-            vector=riasec_results['riasec_vector'])
+            vector=vector.tolist())
         
         print(f"RIASEC results saved for user: {username}")
         return True
@@ -306,6 +406,24 @@ def save_riasec_results(username, answers, riasec_results):
         print(f"Error saving RIASEC results: {e}")
         return False
 
+@lru_cache(maxsize=1024)
+def _parse_json_field(raw: str) -> Dict:
+    """Parse a JSON-encoded property once per distinct value"""
+    try:
+        parsed = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+def _load_json_field(raw) -> Dict:
+    """Return a JSON property as a dict, accepting already-decoded maps"""
+    if isinstance(raw, dict):
+        return raw
+    if isinstance(raw, str) and raw:
+        # Copy so callers cannot mutate the cached parse
+        return dict(_parse_json_field(raw))
+    return {}
+
 def get_user_riasec_results(username):
     """Get complete RIASEC results from Neo4j"""
     if not driver:
@@ -325,24 +443,10 @@ def get_user_riasec_results(username):
             """, username=username).single()
             
             if result and result.get("completed"):
-                scores_data = {}
-                if result["scores"]:
-                    try:
-                        scores_data = json.loads(result["scores"])
-                    except:
-                        scores_data = {}
-                
-                answers_data = {}
-                if result["answers"]:
-                    try:
-                        answers_data = json.loads(result["answers"])
-                    except:
-                        answers_data = {}
-                
                 return {
-                    'scores': scores_data,
+                    'scores': _load_json_field(result["scores"]),
                     'top3': result["top3"] if result["top3"] else [],
-                    'answers': answers_data,
+                    'answers': _load_json_field(result["answers"]),
                     'vector': result["vector"] if result["vector"] else [],
                     'timestamp': result["timestamp"] if result["timestamp"] else "Unknown"
                 }
@@ -416,7 +520,7 @@ def calculate_riasec_scores(answers):
         for trait in scores:
             scores[trait] = scores[trait] / total
     
-    top3 = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:3]
+    top3 = nlargest(3, scores.items(), key=lambda x: x[1])
     
     return {
         'scores': scores,
@@ -424,81 +528,127 @@ def calculate_riasec_scores(answers):
         'riasec_vector': [scores['R'], scores['I'], scores['A'], scores['S'], scores['E'], scores['C']]
     }
 
+_TRAIT_NAMES = MappingProxyType({
+    'R': 'Realistic',
+    'I': 'Investigative',
+    'A': 'Artistic',
+    'S': 'Social',
+    'E': 'Enterprising',
+    'C': 'Conventional'
+})
+
+_TRAIT_DESCRIPTIONS = MappingProxyType({
+    'R': MappingProxyType({
+        'name': 'Realistic',
+        'description': 'Practical, physical, hands-on, tool-oriented people who enjoy working with machines, tools, plants and animals.',
+        'skills': ('Manual dexterity', 'Technical skills', 'Mechanical ability', 'Physical coordination'),
+        'work_env': 'Outdoor, hands-on, practical work environments',
+        'common_careers': ('Engineer', 'Mechanic', 'Farmer', 'Police Officer', 'Military')
+    }),
+    'I': MappingProxyType({
+        'name': 'Investigative',
+        'description': 'Analytical, intellectual, scientific, explorative people who enjoy observation, investigation and problem-solving.',
+        'skills': ('Analytical thinking', 'Research skills', 'Scientific reasoning', 'Problem-solving'),
+        'work_env': 'Research labs, academic settings, scientific environments',
+        'common_careers': ('Scientist', 'Researcher', 'Doctor', 'Programmer', 'Mathematician')
+    }),
+    'A': MappingProxyType({
+        'name': 'Artistic',
+        'description': 'Creative, original, intuitive, expressive people who enjoy creative activities like art, drama, crafts, dance, music, or creative writing.',
+        'skills': ('Creativity', 'Imagination', 'Artistic ability', 'Originality'),
+        'work_env': 'Unstructured environments allowing creative expression',
+        'common_careers': ('Artist', 'Designer', 'Writer', 'Musician', 'Actor')
+    }),
+    'S': MappingProxyType({
+        'name': 'Social',
+        'description': 'Cooperative, supportive, helpful, empathetic people who enjoy working with people to educate, help, or serve them.',
+        'skills': ('Communication', 'Empathy', 'Teaching ability', 'Interpersonal skills'),
+        'work_env': 'Team-oriented, community-focused, helping environments',
+        'common_careers': ('Teacher', 'Counselor', 'Nurse', 'Social Worker', 'Psychologist')
+    }),
+    'E': MappingProxyType({
+        'name': 'Enterprising',
+        'description': 'Persuasive, energetic, ambitious, risk-taking people who enjoy leadership roles, business activities, and influencing others.',
+        'skills': ('Leadership', 'Persuasion', 'Negotiation', 'Strategic planning'),
+        'work_env': 'Competitive, fast-paced, business-oriented environments',
+        'common_careers': ('Entrepreneur', 'Manager', 'Lawyer', 'Sales Executive', 'Politician')
+    }),
+    'C': MappingProxyType({
+        'name': 'Conventional',
+        'description': 'Detail-oriented, organized, structured people who enjoy working with data, numbers, and systematic approaches to tasks.',
+        'skills': ('Organization', 'Attention to detail', 'Numerical ability', 'Reliability'),
+        'work_env': 'Structured, orderly, systematic work environments',
+        'common_careers': ('Accountant', 'Banker', 'Administrator', 'Data Analyst', 'Office Manager')
+    })
+})
+
+_UNKNOWN_TRAIT_DESCRIPTION = MappingProxyType({
+    'name': 'Unknown',
+    'description': 'No description available',
+    'skills': (),
+    'work_env': 'Unknown',
+    'common_careers': ()
+})
+
 def get_trait_name(trait_code):
     """Get full name for RIASEC trait codes"""
-    trait_names = {
-        'R': 'Realistic',
-        'I': 'Investigative', 
-        'A': 'Artistic',
-        'S': 'Social',
-        'E': 'Enterprising',
-        'C': 'Conventional'
-    }
-    return trait_names.get(trait_code, 'Unknown')
+    return _TRAIT_NAMES.get(trait_code, 'Unknown')
 
 def get_riasec_trait_description(trait_code):
     """Get detailed description for RIASEC traits"""
-    descriptions = {
-        'R': {
-            'name': 'Realistic',
-            'description': 'Practical, physical, hands-on, tool-oriented people who enjoy working with machines, tools, plants and animals.',
-            'skills': ['Manual dexterity', 'Technical skills', 'Mechanical ability', 'Physical coordination'],
-            'work_env': 'Outdoor, hands-on, practical work environments',
-            'common_careers': ['Engineer', 'Mechanic', 'Farmer', 'Police Officer', 'Military']
-        },
-        'I': {
-            'name': 'Investigative',
-            'description': 'Analytical, intellectual, scientific, explorative people who enjoy observation, investigation and problem-solving.',
-            'skills': ['Analytical thinking', 'Research skills', 'Scientific reasoning', 'Problem-solving'],
-            'work_env': 'Research labs, academic settings, scientific environments',
-            'common_careers': ['Scientist', 'Researcher', 'Doctor', 'Programmer', 'Mathematician']
-        },
-        'A': {
-            'name': 'Artistic',
-            'description': 'Creative, original, intuitive, expressive people who enjoy creative activities like art, drama, crafts, dance, music, or creative writing.',
-            'skills': ['Creativity', 'Imagination', 'Artistic ability', 'Originality'],
-            'work_env': 'Unstructured environments allowing creative expression',
-            'common_careers': ['Artist', 'Designer', 'Writer', 'Musician', 'Actor']
-        },
-        'S': {
-            'name': 'Social',
-            'description': 'Cooperative, supportive, helpful, empathetic people who enjoy working with people to educate, help, or serve them.',
-            'skills': ['Communication', 'Empathy', 'Teaching ability', 'Interpersonal skills'],
-            'work_env': 'Team-oriented, community-focused, helping environments',
-            'common_careers': ['Teacher', 'Counselor', 'Nurse', 'Social Worker', 'Psychologist']
-        },
-        'E': {
-            'name': 'Enterprising',
-            'description': 'Persuasive, energetic, ambitious, risk-taking people who enjoy leadership roles, business activities, and influencing others.',
-            'skills': ['Leadership', 'Persuasion', 'Negotiation', 'Strategic planning'],
-            'work_env': 'Competitive, fast-paced, business-oriented environments',
-            'common_careers': ['Entrepreneur', 'Manager', 'Lawyer', 'Sales Executive', 'Politician']
-        },
-        'C': {
-            'name': 'Conventional',
-            'description': 'Detail-oriented, organized, structured people who enjoy working with data, numbers, and systematic approaches to tasks.',
-            'skills': ['Organization', 'Attention to detail', 'Numerical ability', 'Reliability'],
-            'work_env': 'Structured, orderly, systematic work environments',
-            'common_careers': ['Accountant', 'Banker', 'Administrator', 'Data Analyst', 'Office Manager']
-        }
-    }
-    
-    return descriptions.get(trait_code, {
-        'name': 'Unknown',
-        'description': 'No description available',
-        'skills': [],
-        'work_env': 'Unknown',
-        'common_careers': []
-    })
+    return _TRAIT_DESCRIPTIONS.get(trait_code, _UNKNOWN_TRAIT_DESCRIPTION)
 
 # ============================================================================
 # MEMORY MANAGEMENT SYSTEM
 # ============================================================================
 
+# Transcript labels for build_context; anything that isn't the user is the assistant
+_ROLE = {'user': 'Student', 'assistant': 'Assistant'}.get
+
 class SlidingWindowMemory:
-    def __init__(self, recent_messages_count=6, max_context_tokens=1500):
+    # Patterns are class attributes so they are compiled once per process, not per call.
+    # The name regex only runs when one of its trigger phrases is present
+    _NAME_TRIGGERS = ("my name is", "i am", "i'm", "call me")
+
+    _NAME_RE = re.compile(r"\b(?:my name is|i am|i'm|call me)\s+([^\W\d_]+)\b", re.IGNORECASE)
+
+    # (trigger substring, compiled pattern, confidence): the regex only runs when the trigger is present
+    _INTEREST_PATTERNS = tuple((trigger, re.compile(p, re.IGNORECASE), confidence) for trigger, p, confidence in (
+        ("interested in", r'interested in ([^.!?\n]+)', 0.9),
+        ("want to learn", r'want to learn (?:about )?([^.!?\n]+)', 0.8),
+        ("studying", r'studying ([^.!?\n]+)', 0.85),
+        ("passionate about", r'passionate about ([^.!?\n]+)', 0.95)
+    ))
+
+    _COURSE_CODE_RE = re.compile(r'\b([A-Z]{2,4}[-\s]?\d{2,3})\b')
+
+    _UPPER_BYTES = bytes(range(ord('A'), ord('Z') + 1))
+
+    _STOP_NAMES = frozenset({'interested', 'learning', 'studying'})
+
+    def __init__(self, recent_messages_count=6, max_context_tokens=1500, max_sessions=1024):
         self.recent_messages_count = recent_messages_count
         self.max_context_tokens = max_context_tokens
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        # Request threads share this instance; eviction and insert must not interleave
+        self._lock = threading.Lock()
+
+    def get_memory(self, username) -> Dict:
+        """Return the per-user memory, creating it on first use"""
+        with self._lock:
+            memory = self.sessions.get(username)
+            if memory is None:
+                if len(self.sessions) >= self.max_sessions:
+                    # Evict the oldest session (dicts keep insertion order)
+                    self.sessions.pop(next(iter(self.sessions)), None)
+                memory = self.sessions[username] = self.initialize_memory()
+            return memory
+
+    def forget(self, username):
+        """Drop cached memory for a user, e.g. after their history is cleared"""
+        with self._lock:
+            self.sessions.pop(username, None)
 
     def initialize_memory(self):
         return {
@@ -506,67 +656,75 @@ class SlidingWindowMemory:
                 'name': None,
                 'interests': {},
                 'career_goals': {},
-                'mentioned_courses': set()
+                # Insertion-ordered dict used as an ordered set, most recent last
+                'mentioned_courses': {}
             },
             'conversation_summary': "",
             'last_summarized_index': 0,
+            'last_processed_index': 0,
             'last_updated': datetime.now(pytz.timezone("Asia/Kolkata")).isoformat()
         }
 
-    def extract_user_profile(self, messages: List[Dict]) -> Dict:
-        memory = self.initialize_memory()
-        profile = memory['user_profile']
+    def extract_user_profile(self, messages: List[Dict], profile: Dict = None, start_idx: int = 0) -> Dict:
+        """Update profile in place from messages[start_idx:] (fresh profile if none given)"""
+        if profile is None:
+            profile = self.initialize_memory()['user_profile']
 
-        for msg in messages:
+        for msg in islice(messages, start_idx, None):
             if msg['role'] != 'user':
                 continue
 
             content = msg['content']
             content_lower = content.lower()
 
-            if not profile['name']:
-                name_patterns = [
-                    r'my name is (\w+)',
-                    r'i am (\w+)(?:\s|$|[,.])',
-                    r'i\'m (\w+)(?:\s|$|[,.])',
-                    r'call me (\w+)'
-                ]
-
-                for pattern in name_patterns:
-                    match = re.search(pattern, content_lower)
-                    if match:
-                        name = match.group(1).strip()
-                        if (len(name) > 1 and name.isalpha() and
-                                name.lower() not in ['interested', 'learning', 'studying']):
-                            profile['name'] = name.title()
-                            break
-
-            interest_patterns = [
-                (r'interested in ([^.!?\n]+)', 0.9),
-                (r'want to learn (?:about )?([^.!?\n]+)', 0.8),
-                (r'studying ([^.!?\n]+)', 0.85),
-                (r'passionate about ([^.!?\n]+)', 0.95)
-            ]
-
-            for pattern, confidence in interest_patterns:
-                matches = re.findall(pattern, content_lower)
-                for match in matches:
+            if not profile['name'] and any(t in content_lower for t in self._NAME_TRIGGERS):
+                for match in self._NAME_RE.finditer(content_lower):
+                    name = match.group(1)
+                    if len(name) > 1 and name not in self._STOP_NAMES:
+                        profile['name'] = name.title()
+                        break
+
+            found = []
+            for trigger, interest_re, confidence in self._INTEREST_PATTERNS:
+                if trigger not in content_lower:
+                    continue
+                for match in interest_re.findall(content_lower):
                     interest = match.strip()
-                    if interest and len(interest) > 2 and len(interest) < 50:
-                        profile['interests'][interest] = max(
-                            profile['interests'].get(interest, 0),
-                            confidence
-                        )
-
-            course_codes = re.findall(r'\b([A-Z]{2,4}[-\s]?\d{2,3})\b', content)
-            for code in course_codes:
-                profile['mentioned_courses'].add(code.upper().replace(' ', '-'))
+                    if 2 < len(interest) < 50:
+                        found.append((interest, confidence))
+
+            if found:
+                interests = profile['interests']
+                for interest, confidence in found:
+                    previous = interests.get(interest)
+                    if previous is None or confidence > previous:
+                        interests[interest] = confidence
+
+            # Course codes need ASCII uppercase letters; most chat messages have none.
+            # bytes.translate deletes A-Z in one C-level pass, so a length change means a hit.
+            raw = content.encode('ascii', 'ignore')
+            if len(raw.translate(None, self._UPPER_BYTES)) == len(raw):
+                continue
+            mentioned = profile['mentioned_courses']
+            for code in self._COURSE_CODE_RE.findall(content):
+                code = code.upper().replace(' ', '-')
+                # Re-insert so a repeated mention moves to the end
+                mentioned.pop(code, None)
+                mentioned[code] = None
 
         return profile
 
-    def build_context(self, messages: List[Dict], current_query: str, client=None, username=None) -> str:
-        memory = self.initialize_memory()
-        profile = self.extract_user_profile(messages)
+    def build_context(self, messages: List[Dict], current_query: str, client=None, username=None,
+                      memory: Dict = None) -> str:
+        if memory is None:
+            memory = self.get_memory(username) if username else self.initialize_memory()
+
+        # History shrank (e.g. cleared elsewhere): rebuild the profile from scratch
+        if memory['last_processed_index'] > len(messages):
+            memory.update(self.initialize_memory())
+
+        profile = self.extract_user_profile(messages, memory['user_profile'], memory['last_processed_index'])
+        memory['last_processed_index'] = len(messages)
 
         context_parts = []
         user_message_count = sum(1 for msg in messages if msg['role'] == 'user' and not msg.get('is_code'))
@@ -574,14 +732,10 @@ class SlidingWindowMemory:
         # Add user's display name from profile
         if username and driver:
             try:
-                with driver.session(database=NEO4J_DATABASE) as s:
-                    result = s.run("""
-                        MATCH (u:User {username: $username})
-                        RETURN u.display_name AS display_name
-                    """, username=username).single()
-                    if result and result['display_name']:
-                        context_parts.append(f"USER NAME: {result['display_name']}")
-            except:
+                display_name = _get_display_name(username)
+                if display_name:
+                    context_parts.append(f"USER NAME: {display_name}")
+            except Exception:
                 pass
 
         if user_message_count <= 1:
@@ -594,102 +748,91 @@ class SlidingWindowMemory:
             if profile['name']:
                 profile_lines.append(f"Name: {profile['name']}")
             if profile['interests']:
-                top_interests = sorted(profile['interests'].items(), key=lambda x: x[1], reverse=True)[:3]
+                top_interests = nlargest(3, profile['interests'].items(), key=lambda x: x[1])
                 interests_str = ', '.join([i for i, _ in top_interests])
                 profile_lines.append(f"Interests: {interests_str}")
             if profile['mentioned_courses']:
-                courses_str = ', '.join(list(profile['mentioned_courses'])[-3:])
+                latest = list(islice(reversed(profile['mentioned_courses']), 3))
+                courses_str = ', '.join(reversed(latest))
                 profile_lines.append(f"Courses discussed: {courses_str}")
 
             context_parts.append('\n'.join(profile_lines))
 
         if len(messages) > self.recent_messages_count:
-            recent_msgs = messages[-self.recent_messages_count:]
-            if recent_msgs:
-                recent_lines = ["RECENT MESSAGES:"]
-                for msg in recent_msgs:
-                    if msg.get('is_code'):
-                        continue
-                    role = "Student" if msg['role'] == 'user' else "Assistant"
-                    content = msg['content']
-                    if len(content) > 150:
-                        content = content[:150] + "..."
-                    recent_lines.append(f"{role}: {content}")
-
-                context_parts.append('\n'.join(recent_lines))
+            heading, shown = "RECENT MESSAGES:", messages[-self.recent_messages_count:]
         else:
-            if messages:
-                msg_lines = ["CONVERSATION HISTORY:"]
-                for msg in messages:
-                    if msg.get('is_code'):
-                        continue
-                    role = "Student" if msg['role'] == 'user' else "Assistant"
-                    content = msg['content']
-                    if len(content) > 150:
-                        content = content[:150] + "..."
-                    msg_lines.append(f"{role}: {content}")
-
-                context_parts.append('\n'.join(msg_lines))
+            heading, shown = "CONVERSATION HISTORY:", messages
+
+        if shown:
+            context_parts.append('\n'.join([heading] + [
+                f"{_ROLE(msg['role'], 'Assistant')}: "
+                f"{msg['content'] if len(msg['content']) <= 150 else msg['content'][:150] + '...'}"
+                for msg in shown if not msg.get('is_code')
+            ]))
 
         return '\n\n'.join(context_parts)
 
+# Shared across requests so each user's profile is only extended with new messages
+_chat_memory = SlidingWindowMemory(recent_messages_count=6, max_context_tokens=1500)
+
 # ============================================================================
 # PLAYLIST FUNCTIONS - ENHANCED WITH SEMESTER AND FULL DETAILS
 # ============================================================================
 
+def _semester_values(semester) -> List[Any]:
+    """Stored forms of a semester number, for an index-friendly IN filter"""
+    return [int(semester), str(semester), f"Sem {semester}", f"Semester {semester}"]
+
 def get_user_playlist(username, semester=None):
     """Get all courses in user's playlist from Neo4j with full details and optional semester filter"""
     if not driver:
         return []
     try:
-        with driver.session(database=NEO4J_DATABASE) as s:
-            if semester:
-                # Filter by semester
-                result = s.run("""
-                    MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[:CONTAINS]->(c:Course)
-                    WHERE c.recommended_semester = $semester OR c.recommended_semester CONTAINS $sem_str
-                    RETURN c.course_code AS course_code,
-                           c.course_title AS course_title,
-                           c.subject_area AS subject_area,
-                           c.credits AS credits,
-                           c.level AS level,
-                           c.department AS department,
-                           c.description AS description,
-                           c.prereq_course_codes AS prerequisites,
-                           c.recommended_semester AS recommended_semester,
-                           c.category AS category,
-                           c.duration AS duration,
-                           c.instructor AS instructor,
-                           c.R AS R, c.I AS I, c.A AS A, c.S AS S, c.E AS E, c.C AS C,
-                           c.course_riasec_vector AS course_riasec_vector
-                    ORDER BY c.course_code
-                """, username=username, semester=int(semester), sem_str=str(semester))
-            else:
-                # Get all courses
-                result = s.run("""
-                    MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[:CONTAINS]->(c:Course)
-                    RETURN c.course_code AS course_code,
-                           c.course_title AS course_title,
-                           c.subject_area AS subject_area,
-                           c.credits AS credits,
-                           c.level AS level,
-                           c.department AS department,
-                           c.description AS description,
-                           c.prereq_course_codes AS prerequisites,
-                           c.recommended_semester AS recommended_semester,
-                           c.category AS category,
-                           c.duration AS duration,
-                           c.instructor AS instructor,
-                           c.R AS R, c.I AS I, c.A AS A, c.S AS S, c.E AS E, c.C AS C,
-                           c.course_riasec_vector AS course_riasec_vector
-                    ORDER BY c.recommended_semester, c.course_code
-                """, username=username)
-            
-            courses = []
-            for record in result:
-                course_dict = dict(record)
-                courses.append(course_dict)
-            return courses
+        if semester:
+            # Filter by semester
+            return driver.execute_query("""
+                MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[:CONTAINS]->(c:Course)
+                WHERE c.recommended_semester IN $sems
+                RETURN c.course_code AS course_code,
+                       c.course_title AS course_title,
+                       c.subject_area AS subject_area,
+                       c.credits AS credits,
+                       c.level AS level,
+                       c.department AS department,
+                       c.description AS description,
+                       c.prereq_course_codes AS prerequisites,
+                       c.recommended_semester AS recommended_semester,
+                       c.category AS category,
+                       c.duration AS duration,
+                       c.instructor AS instructor,
+                       c.R AS R, c.I AS I, c.A AS A, c.S AS S, c.E AS E, c.C AS C,
+                       c.course_riasec_vector AS course_riasec_vector
+                ORDER BY c.course_code
+            """, username=username, sems=_semester_values(semester),
+                database_=NEO4J_DATABASE, routing_=RoutingControl.READ,
+                result_transformer_=Result.data)
+        else:
+            # Get all courses
+            return driver.execute_query("""
+                MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[:CONTAINS]->(c:Course)
+                RETURN c.course_code AS course_code,
+                       c.course_title AS course_title,
+                       c.subject_area AS subject_area,
+                       c.credits AS credits,
+                       c.level AS level,
+                       c.department AS department,
+                       c.description AS description,
+                       c.prereq_course_codes AS prerequisites,
+                       c.recommended_semester AS recommended_semester,
+                       c.category AS category,
+                       c.duration AS duration,
+                       c.instructor AS instructor,
+                       c.R AS R, c.I AS I, c.A AS A, c.S AS S, c.E AS E, c.C AS C,
+                       c.course_riasec_vector AS course_riasec_vector
+                ORDER BY c.recommended_semester, c.course_code
+            """, username=username,
+                database_=NEO4J_DATABASE, routing_=RoutingControl.READ,
+                result_transformer_=Result.data)
     except Exception as e:
         print(f"Error loading playlist: {e}")
         return []
@@ -707,54 +850,47 @@ def add_to_playlist(username, course_code):
         playlist_id = f"{username}_playlist"
         print(f"🔹 Computed playlist_id: {playlist_id}")
 
-        with driver.session(database=NEO4J_DATABASE) as s:
-            print("🔹 Checking if course exists...")
-            course_check = s.run("""
-                MATCH (c:Course {course_code: $course_code})
-                RETURN c.course_code AS code, 
-                       c.course_title AS title,
-                       c.credits AS credits,
-                       c.recommended_semester AS semester
-            """, course_code=course_code).single()
+        print("🔹 Linking course to playlist...")
+        course_check = driver.execute_query("""
+            MATCH (u:User {username: $username})
+            MATCH (c:Course {course_code: $course_code})
+            MERGE (p:Playlist {id: $playlist_id})
+              ON CREATE SET p.name = $playlist_name, p.created_at = datetime()
+            MERGE (u)-[:HAS_PLAYLIST]->(p)
+            WITH c, p
+            OPTIONAL MATCH (p)-[existing:CONTAINS]->(c)
+            WITH c, p, existing IS NULL AS was_new
+            MERGE (p)-[r:CONTAINS]->(c)
+              ON CREATE SET r.added = datetime()
+            RETURN c.course_code AS code,
+                   c.course_title AS title,
+                   c.credits AS credits,
+                   c.recommended_semester AS semester,
+                   was_new
+        """, username=username, course_code=course_code,
+            playlist_id=playlist_id, playlist_name="My Playlist",
+            database_=NEO4J_DATABASE, result_transformer_=Result.single)
 
-            if not course_check:
-                print("❌ Course not found in Neo4j")
-                return {"success": False, "message": "Course not found"}
-            print(f"✅ Course found: {course_check['code']} - {course_check['title']}")
+        if not course_check:
+            print("❌ Course not found in Neo4j")
+            return {"success": False, "message": "Course not found"}
 
-            print("🔹 Checking if course already exists in playlist...")
-            already_exists = s.run("""
-                MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[:CONTAINS]->(c:Course {course_code: $course_code})
-                RETURN c
-            """, username=username, course_code=course_code).single()
+        if not course_check['was_new']:
+            print("⚠️ Course already exists in playlist")
+            return {"success": False, "message": "Course already in playlist"}
 
-            if already_exists:
-                print("⚠️ Course already exists in playlist")
-                return {"success": False, "message": "Course already in playlist"}
+        print("✅ Course successfully added to playlist in Neo4j")
 
-            print("🔹 Creating/fetching playlist and linking course...")
-            s.run("""
-                MATCH (u:User {username: $username})
-                MATCH (c:Course {course_code: $course_code})
-                MERGE (p:Playlist {id: $playlist_id})
-                  ON CREATE SET p.name = $playlist_name, p.created_at = datetime()
-                MERGE (u)-[:HAS_PLAYLIST]->(p)
-                MERGE (p)-[:CONTAINS]->(c)
-            """, username=username, course_code=course_code,
-                 playlist_id=playlist_id, playlist_name="My Playlist")
-
-            print("✅ Course successfully added to playlist in Neo4j")
-
-            return {
-                "success": True,
-                "message": f"Added {course_code} to playlist",
-                "course_details": {
-                    "code": course_check['code'],
-                    "title": course_check['title'],
-                    "credits": course_check['credits'],
-                    "semester": course_check['semester']
-                }
+        return {
+            "success": True,
+            "message": f"Added {course_code} to playlist",
+            "course_details": {
+                "code": course_check['code'],
+                "title": course_check['title'],
+                "credits": course_check['credits'],
+                "semester": course_check['semester']
             }
+        }
 
     except Exception as e:
         print(f"❌ [ERROR] add_to_playlist: {e}")
@@ -766,17 +902,17 @@ def remove_from_playlist(username, course_code):
         return {"success": False, "message": "Database connection error"}
 
     try:
-        with driver.session(database=NEO4J_DATABASE) as s:
-            result = s.run("""
-                MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[r:CONTAINS]->(c:Course {course_code: $course_code})
-                DELETE r
-                RETURN c.course_code AS code
-            """, username=username, course_code=course_code).single()
-
-            if result:
-                return {"success": True, "message": f"Removed {course_code} from playlist"}
-            else:
-                return {"success": False, "message": "Course not found in playlist"}
+        result = driver.execute_query("""
+            MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[r:CONTAINS]->(c:Course {course_code: $course_code})
+            DELETE r
+            RETURN c.course_code AS code
+        """, username=username, course_code=course_code,
+            database_=NEO4J_DATABASE, result_transformer_=Result.single)
+
+        if result:
+            return {"success": True, "message": f"Removed {course_code} from playlist"}
+        else:
+            return {"success": False, "message": "Course not found in playlist"}
     except Exception as e:
         print(f"Error removing from playlist: {e}")
         return {"success": False, "message": f"Error: {str(e)}"}
@@ -786,12 +922,12 @@ def get_playlist_count(username):
     if not driver:
         return 0
     try:
-        with driver.session(database=NEO4J_DATABASE) as s:
-            result = s.run("""
-                MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[:CONTAINS]->(c:Course)
-                RETURN count(c) AS count
-            """, username=username).single()
-            return result['count'] if result else 0
+        result = driver.execute_query("""
+            MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[:CONTAINS]->(c:Course)
+            RETURN count(c) AS count
+        """, username=username, database_=NEO4J_DATABASE,
+            routing_=RoutingControl.READ, result_transformer_=Result.single)
+        return result['count'] if result else 0
     except Exception as e:
         print(f"Error getting playlist count: {e}")
         return 0
@@ -800,86 +936,111 @@ def get_playlist_count(username):
 # COURSE PROPERTY EXTRACTION & FORMATTING
 # ============================================================================
 
+_COURSE_DEFAULTS = {
+    'course_code': 'N/A',
+    'description': 'No description available',
+    'credits': 'N/A',
+    'level': 'Beginner',
+    'department': 'N/A',
+    'category': 'ELECTIVE',
+    'duration': 'N/A',
+    'instructor': 'TBD',
+    'subject_area': 'N/A',
+    'R': 0.0, 'I': 0.0, 'A': 0.0, 'S': 0.0, 'E': 0.0, 'C': 0.0
+}
+
+_RIASEC_ORDER = ('R', 'I', 'A', 'S', 'E', 'C')
+
+# Ten-cell score bars indexed by int(score * 10)
+_RIASEC_BARS = tuple("█" * n + "░" * (10 - n) for n in range(11))
+
+@dataclass(slots=True)
+class CourseProps:
+    """Display-ready course properties, built once per course record"""
+    course_code: Any
+    course_title: Any
+    description: Any
+    credits: Any
+    level: Any
+    department: Any
+    semester: Any
+    category: Any
+    duration: Any
+    instructor: Any
+    subject_area: Any
+    prerequisites: Any
+    riasec_alignment: Dict[str, float]
+    riasec_vector: Optional[Dict[str, float]] = None
+
+    @classmethod
+    def from_dict(cls, course_dict: Dict) -> "CourseProps":
+        props = {**_COURSE_DEFAULTS, **{k: v for k, v in course_dict.items() if v is not None}}
+
+        vector = props.get('course_riasec_vector')
+        riasec_vector = None
+        if vector:
+            riasec_vector = {trait: vector[i] if i < len(vector) else 0
+                             for i, trait in enumerate(_RIASEC_ORDER)}
+
+        return cls(
+            course_code=props['course_code'],
+            course_title=props.get('course_title') or props.get('title') or 'N/A',
+            description=props['description'],
+            credits=props['credits'],
+            level=props['level'],
+            department=props['department'],
+            semester=props.get('recommended_semester') or props.get('semester') or 'Elective',
+            category=props['category'],
+            duration=props['duration'],
+            instructor=props['instructor'],
+            subject_area=props['subject_area'],
+            prerequisites=props.get('prerequisites') or props.get('prereq_course_codes') or 'None',
+            riasec_alignment={trait: props[trait] for trait in _RIASEC_ORDER},
+            riasec_vector=riasec_vector
+        )
+
 def extract_all_course_properties(course_dict: Dict) -> Dict:
     """Extract all course properties from Neo4j result with RIASEC data"""
-    extracted = {}
-    
-    # Basic course info
-    extracted['course_code'] = course_dict.get('course_code', 'N/A')
-    extracted['course_title'] = course_dict.get('course_title') or course_dict.get('title', 'N/A')
-    extracted['description'] = course_dict.get('description', 'No description available')
-    extracted['credits'] = course_dict.get('credits', 'N/A')
-    extracted['level'] = course_dict.get('level', 'Beginner')
-    extracted['department'] = course_dict.get('department', 'N/A')
-    extracted['semester'] = course_dict.get('recommended_semester') or course_dict.get('semester', 'Elective')
-    extracted['category'] = course_dict.get('category', 'ELECTIVE')
-    extracted['duration'] = course_dict.get('duration', 'N/A')
-    extracted['instructor'] = course_dict.get('instructor', 'TBD')
-    extracted['subject_area'] = course_dict.get('subject_area', 'N/A')
-    extracted['prerequisites'] = course_dict.get('prerequisites') or course_dict.get('prereq_course_codes', 'None')
-    
-    # RIASEC alignment scores
-    riasec_scores = {
-        'R': course_dict.get('R', 0.0),
-        'I': course_dict.get('I', 0.0),
-        'A': course_dict.get('A', 0.0),
-        'S': course_dict.get('S', 0.0),
-        'E': course_dict.get('E', 0.0),
-        'C': course_dict.get('C', 0.0)
-    }
-    extracted['riasec_alignment'] = riasec_scores
-    
-    # Course RIASEC vector
-    if course_dict.get('course_riasec_vector'):
-        vector = course_dict.get('course_riasec_vector', [])
-        extracted['riasec_vector'] = {
-            'R': vector[0] if len(vector) > 0 else 0,
-            'I': vector[1] if len(vector) > 1 else 0,
-            'A': vector[2] if len(vector) > 2 else 0,
-            'S': vector[3] if len(vector) > 3 else 0,
-            'E': vector[4] if len(vector) > 4 else 0,
-            'C': vector[5] if len(vector) > 5 else 0
-        }
-    
+    props = CourseProps.from_dict(course_dict)
+    extracted = {name: getattr(props, name) for name in CourseProps.__slots__}
+    if extracted['riasec_vector'] is None:
+        del extracted['riasec_vector']
     return extracted
 
 def format_course_for_display(course_dict: Dict, detailed=False) -> str:
     """Format course data for human-readable display"""
-    props = extract_all_course_properties(course_dict)
+    props = CourseProps.from_dict(course_dict)
     
     if detailed:
         # Full detailed view
         lines = [
-            f"📚 **{props['course_code']}: {props['course_title']}**",
+            f"📚 **{props.course_code}: {props.course_title}**",
             f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
-            f"📝 **Description:** {props['description']}",
-            f"📊 **Credits:** {props['credits']}",
-            f"🎓 **Level:** {props['level']}",
-            f"🏢 **Department:** {props['department']}",
-            f"📅 **Semester:** {props['semester']}",
-            f"🏷️  **Category:** {props['category']}",
-            f"⏱️  **Duration:** {props['duration']}",
-            f"👨‍🏫 **Instructor:** {props['instructor']}",
-            f"📍 **Subject Area:** {props['subject_area']}",
-            f"📋 **Prerequisites:** {props['prerequisites'] if props['prerequisites'] != 'None' else 'None - Foundation course'}",
+            f"📝 **Description:** {props.description}",
+            f"📊 **Credits:** {props.credits}",
+            f"🎓 **Level:** {props.level}",
+            f"🏢 **Department:** {props.department}",
+            f"📅 **Semester:** {props.semester}",
+            f"🏷️  **Category:** {props.category}",
+            f"⏱️  **Duration:** {props.duration}",
+            f"👨‍🏫 **Instructor:** {props.instructor}",
+            f"📍 **Subject Area:** {props.subject_area}",
+            f"📋 **Prerequisites:** {props.prerequisites if props.prerequisites != 'None' else 'None - Foundation course'}",
         ]
         
         # Add RIASEC alignment
-        riasec = props.get('riasec_alignment', {})
+        riasec = props.riasec_alignment
         if any(riasec.values()):
             lines.append("🎯 **Career Personality Alignment:**")
-            trait_names = {'R': 'Realistic', 'I': 'Investigative', 'A': 'Artistic', 
-                          'S': 'Social', 'E': 'Enterprising', 'C': 'Conventional'}
             for trait, score in riasec.items():
                 if score > 0:
-                    bar_length = int(score * 10)
-                    bar = "█" * bar_length + "░" * (10 - bar_length)
-                    lines.append(f"  {trait_names[trait]}: {bar} {score:.1%}")
+                    bar = _RIASEC_BARS[min(int(score * 10), 10)]
+                    lines.append(f"  {_TRAIT_NAMES[trait]}: {bar} {score:.1%}")
         
         return "\n".join(lines)
     else:
         # Compact view for chat
-        return f"**{props['course_code']}** - {props['course_title']} ({props['level']}, {props['credits']} credits, Sem {props['semester']})"
+        return f"**{props.course_code}** - {props.course_title} ({props.level}, {props.credits} credits, Sem {props.semester})"
 
 def format_courses_for_chat_response(courses, max_courses=5):
     """Format courses for chat display with all properties"""
@@ -888,19 +1049,19 @@ def format_courses_for_chat_response(courses, max_courses=5):
     
     formatted = []
     for course in courses[:max_courses]:
-        props = extract_all_course_properties(course)
+        props = CourseProps.from_dict(course)
         formatted.append({
-            'course_code': props['course_code'],
-            'title': props['course_title'],
-            'description': props['description'][:120] if props['description'] else '',
-            'level': props['level'],
-            'credits': props['credits'],
-            'duration': props['duration'],
-            'semester': props['semester'],
-            'department': props['department'],
-            'prerequisites': props['prerequisites'],
-            'instructor': props['instructor'],
-            'riasec_alignment': props.get('riasec_alignment', {}),
+            'course_code': props.course_code,
+            'title': props.course_title,
+            'description': props.description[:120] if props.description else '',
+            'level': props.level,
+            'credits': props.credits,
+            'duration': props.duration,
+            'semester': props.semester,
+            'department': props.department,
+            'prerequisites': props.prerequisites,
+            'instructor': props.instructor,
+            'riasec_alignment': props.riasec_alignment,
             'score': round(course.get('score', 0) * 100, 1) if course.get('score') else None
         })
     
@@ -910,31 +1071,94 @@ def format_courses_for_chat_response(courses, max_courses=5):
 # DEPENDENCY & PATHWAY FUNCTIONS
 # ============================================================================
 
+# Maps the ';' and newline prereq separators onto ',' for a single str.split
+_SEP_TO_COMMA = str.maketrans(';\n', ',,')
+
+_BAR80 = "=" * 80
+_RULE80 = "─" * 80
+
+_MAX_TREE_DEPTH = 5
+
+def _render_tree(root_code: str, adjacency: List[Dict], lines: List[str], max_depth: int = _MAX_TREE_DEPTH):
+    """Append an 'or'-connected ASCII rendering of a parent -> children adjacency to lines"""
+    children_of = {row["parent"]: row["children"] for row in adjacency if row.get("parent")}
+    # Explicit stack of (prefix, depth, enumerated children) replaces recursion
+    stack = [("", 1, iter(enumerate(children_of.get(root_code, ()))))]
+    while stack:
+        prefix, depth, items = stack[-1]
+        entry = next(items, None)
+        if entry is None:
+            stack.pop()
+            continue
+        i, node = entry
+        connector = "    " if i == 0 else "or  "
+        lines.append(f"{prefix}{connector}{node.get('code', '')} - {node.get('title') or '[Title not available]'}")
+        grandchildren = children_of.get(node.get("code"))
+        if grandchildren and depth < max_depth:
+            stack.append((prefix + "    ", depth + 1, iter(enumerate(grandchildren))))
+
+# Course prerequisite graphs change rarely; cache the variable-length path queries
+_COURSE_GRAPH_CACHE = TTLCache(maxsize=2048, ttl=900)
+_COURSE_GRAPH_CACHE_LOCK = threading.Lock()
+
+def _cached_course_graph(key, fetch) -> Dict[str, Any]:
+    """Return a cached course-graph row, running fetch() on a miss (empty rows are not cached)"""
+    with _COURSE_GRAPH_CACHE_LOCK:
+        row = _COURSE_GRAPH_CACHE.get(key)
+    if row is None:
+        row = fetch()
+        if row:
+            with _COURSE_GRAPH_CACHE_LOCK:
+                _COURSE_GRAPH_CACHE[key] = row
+    return row
+
+def clear_course_graph_cache():
+    """Drop cached dependency/pathway results after course-graph edits"""
+    with _COURSE_GRAPH_CACHE_LOCK:
+        _COURSE_GRAPH_CACHE.clear()
+
 def get_course_dependencies(_drv, course_code: str, direction: str = "prerequisites") -> Dict[str, Any]:
-    """Retrieve course dependency information"""
+    """Retrieve course dependency information as a parent -> children adjacency"""
     if direction == "prerequisites":
         cypher = """
         MATCH (c:Course {course_code: $course_code})
-        OPTIONAL MATCH prereq_path = (c)-[:REQUIRES*1..5]->(pre:Course)
-        WITH c, collect(DISTINCT prereq_path) as paths
+        CALL {
+            WITH c
+            OPTIONAL MATCH prereq_path = (c)-[:REQUIRES*1..5]->(:Course)
+            UNWIND CASE WHEN prereq_path IS NULL THEN [] ELSE relationships(prereq_path) END AS r
+            WITH DISTINCT startNode(r) AS parent, endNode(r) AS child
+            ORDER BY child.course_code
+            WITH parent, collect({code: child.course_code, title: child.course_title}) AS children
+            RETURN collect({parent: parent.course_code, children: children}) AS prerequisite_tree
+        }
         RETURN c.course_code AS course_code,
                c.course_title AS title,
                c.prereq_course_codes AS prereq_codes,
-               [path in paths WHERE path IS NOT NULL | [node in nodes(path) | {code: node.course_code, title: node.course_title}]] AS prerequisite_paths
+               prerequisite_tree
         """
     else:
         cypher = """
         MATCH (c:Course {course_code: $course_code})
-        OPTIONAL MATCH postreq_path = (c)<-[:REQUIRES*1..5]-(post:Course)
-        WITH c, collect(DISTINCT postreq_path) as paths
+        CALL {
+            WITH c
+            OPTIONAL MATCH postreq_path = (c)<-[:REQUIRES*1..5]-(:Course)
+            UNWIND CASE WHEN postreq_path IS NULL THEN [] ELSE relationships(postreq_path) END AS r
+            WITH DISTINCT endNode(r) AS parent, startNode(r) AS child
+            ORDER BY child.course_code
+            WITH parent, collect({code: child.course_code, title: child.course_title}) AS children
+            RETURN collect({parent: parent.course_code, children: children}) AS postrequisite_tree
+        }
         RETURN c.course_code AS course_code,
                c.course_title AS title,
                c.prereq_course_codes AS prereq_codes,
-               [path in paths WHERE path IS NOT NULL | [node in nodes(path) | {code: node.course_code, title: node.course_title}]] AS postrequisite_paths
+               postrequisite_tree
         """
 
-    result = run_read_cypher(_drv, cypher, {'course_code': course_code})
-    return result[0] if result else {}
+    def fetch():
+        result = run_read_cypher(_drv, cypher, {'course_code': course_code})
+        return result[0] if result else {}
+
+    return _cached_course_graph((course_code, direction), fetch)
 
 def build_dependency_tree(_drv, course_code: str, direction: str = "prerequisites") -> Optional[str]:
     """Build ASCII dependency tree visualization"""
@@ -942,11 +1166,10 @@ def build_dependency_tree(_drv, course_code: str, direction: str = "prerequisite
     if not deps:
         return None
 
-    paths_key = "prerequisite_paths" if direction == "prerequisites" else "postrequisite_paths"
-    tree_paths = deps.get(paths_key, []) or []
-    valid_paths = [path for path in tree_paths if path and len(path) > 1]
+    tree_key = "prerequisite_tree" if direction == "prerequisites" else "postrequisite_tree"
+    adjacency = deps.get(tree_key) or []
 
-    if not valid_paths and direction == "postrequisites":
+    if not adjacency and direction == "postrequisites":
         search_query = """
         MATCH (c:Course)
         WHERE c.prereq_course_codes CONTAINS $course_code
@@ -969,9 +1192,9 @@ def build_dependency_tree(_drv, course_code: str, direction: str = "prerequisite
 
             return "\n".join(lines)
 
-    if not valid_paths and direction == "prerequisites":
+    if not adjacency and direction == "prerequisites":
         raw_prereqs = deps.get("prereq_codes") or deps.get("prereq_course_codes") or ""
-        codes = [c.strip() for c in re.split(r'[,;\n]+', raw_prereqs) if c.strip()]
+        codes = [c.strip() for c in raw_prereqs.translate(_SEP_TO_COMMA).split(',') if c.strip()]
         if not codes:
             return None
 
@@ -995,122 +1218,117 @@ def build_dependency_tree(_drv, course_code: str, direction: str = "prerequisite
 
         return "\n".join(lines)
 
-    if not valid_paths:
+    if not adjacency:
         return None
 
-    tree = {}
-    for path in valid_paths:
-        current = tree
-        for node in path[1:]:
-            code = node.get("code", "")
-            title = node.get("title", "")
-            display = f"{code} - {title or '[Title not available]'}"
-            current = current.setdefault(display, {})
-
     direction_label = "Prerequisites" if direction == "prerequisites" else "Courses This Unlocks"
     course_title = deps.get("title", "")
     header = f"{course_code} - {course_title or '[Title not available]'}"
     lines = [f"📚 {header}", f"{'─' * (len(header) + 4)}", direction_label + ":"]
 
-    def render_tree(subtree, prefix=""):
-        items = list(subtree.items())
-        for i, (display_name, children) in enumerate(items):
-            connector = "    " if i == 0 else "or  "
-            lines.append(f"{prefix}{connector}{display_name}")
-            if children:
-                render_tree(children, prefix + "    ")
-
-    render_tree(tree)
+    _render_tree(course_code, adjacency, lines)
     return "\n".join(lines)
 
+def get_course_pathway(_drv, course_code: str) -> Dict[str, Any]:
+    """Retrieve prerequisite/postrequisite adjacency and their fallbacks in one query"""
+    cypher = """
+    MATCH (c:Course {course_code: $course_code})
+    CALL {
+        WITH c
+        OPTIONAL MATCH prereq_path = (c)-[:REQUIRES*1..5]->(:Course)
+        UNWIND CASE WHEN prereq_path IS NULL THEN [] ELSE relationships(prereq_path) END AS r
+        WITH DISTINCT startNode(r) AS parent, endNode(r) AS child
+        ORDER BY child.course_code
+        WITH parent, collect({code: child.course_code, title: child.course_title}) AS children
+        RETURN collect({parent: parent.course_code, children: children}) AS prerequisite_tree
+    }
+    CALL {
+        WITH c
+        OPTIONAL MATCH postreq_path = (c)<-[:REQUIRES*1..5]-(:Course)
+        UNWIND CASE WHEN postreq_path IS NULL THEN [] ELSE relationships(postreq_path) END AS r
+        WITH DISTINCT endNode(r) AS parent, startNode(r) AS child
+        ORDER BY child.course_code
+        WITH parent, collect({code: child.course_code, title: child.course_title}) AS children
+        RETURN collect({parent: parent.course_code, children: children}) AS postrequisite_tree
+    }
+    CALL {
+        // Fallback titles for the raw prereq_course_codes text when no REQUIRES paths exist
+        WITH c, prerequisite_tree
+        WITH c WHERE size(prerequisite_tree) = 0
+        UNWIND split(replace(replace(coalesce(c.prereq_course_codes, ''), ';', ','), '\\n', ','), ',') AS raw_code
+        WITH trim(raw_code) AS code WHERE code <> ''
+        OPTIONAL MATCH (x:Course {course_code: code})
+        RETURN collect({code: code, title: x.course_title}) AS prereq_titles
+    }
+    CALL {
+        // Fallback dependents found by text when no REQUIRES paths lead here
+        WITH c, postrequisite_tree
+        WITH c WHERE size(postrequisite_tree) = 0
+        MATCH (d:Course)
+        WHERE d.prereq_course_codes CONTAINS c.course_code
+        WITH d LIMIT 50
+        RETURN collect({course_code: d.course_code, title: d.course_title}) AS dependents
+    }
+    RETURN c.course_code AS course_code,
+           c.course_title AS title,
+           prerequisite_tree,
+           postrequisite_tree,
+           prereq_titles,
+           dependents
+    """
+
+    def fetch():
+        result = run_read_cypher(_drv, cypher, {'course_code': course_code})
+        return result[0] if result else {}
+
+    return _cached_course_graph((course_code, "pathway"), fetch)
+
 def build_full_pathway_tree(_drv, course_code: str) -> Optional[str]:
     """Build comprehensive ASCII tree showing prerequisites AND postrequisites"""
-    prereq_deps = get_course_dependencies(_drv, course_code, "prerequisites")
-    postreq_deps = get_course_dependencies(_drv, course_code, "postrequisites")
+    pathway = get_course_pathway(_drv, course_code)
 
-    if not prereq_deps and not postreq_deps:
+    if not pathway:
         return None
 
-    course_title = prereq_deps.get("title", "") or postreq_deps.get("title", "")
+    course_title = pathway.get("title", "")
     lines = [
-        "=" * 80,
+        _BAR80,
         f"🎓 COMPLETE LEARNING PATHWAY FOR: {course_code} - {course_title or '[Title not available]'}",
-        "=" * 80,
+        _BAR80,
         ""
     ]
 
     lines.append("📚 PREREQUISITES (What to study BEFORE):")
-    lines.append("─" * 80)
+    lines.append(_RULE80)
 
-    prereq_paths = prereq_deps.get("prerequisite_paths", []) or []
-    valid_prereq_paths = [path for path in prereq_paths if path and len(path) > 1]
+    prereq_tree = pathway.get("prerequisite_tree") or []
 
-    def render_tree(subtree, prefix=""):
-        items = list(subtree.items())
-        for i, (display_name, children) in enumerate(items):
-            connector = "    " if i == 0 else "or  "
-            lines.append(f"{prefix}{connector}{display_name}")
-            if children:
-                render_tree(children, prefix + "    ")
-
-    if valid_prereq_paths:
-        prereq_tree = {}
-        for path in valid_prereq_paths:
-            current = prereq_tree
-            for node in path[1:]:
-                code = node.get("code", "")
-                title = node.get("title", "")
-                display = f"{code} - {title or '[Title not available]'}"
-                current = current.setdefault(display, {})
-        render_tree(prereq_tree)
+    if prereq_tree:
+        _render_tree(course_code, prereq_tree, lines)
     else:
-        raw_prereqs = prereq_deps.get("prereq_codes") or prereq_deps.get("prereq_course_codes") or ""
-        codes = [c.strip() for c in re.split(r'[,;\n]+', raw_prereqs) if c.strip()]
-        if codes:
-            cypher_titles = """
-            UNWIND $codes AS code
-            OPTIONAL MATCH (x:Course {course_code: code})
-            RETURN code AS code, x.course_title AS title
-            """
-            rows = run_read_cypher(_drv, cypher_titles, {"codes": codes}) or []
-            title_map = {r.get("code"): r.get("title") or "" for r in rows}
-            for i, code in enumerate(codes):
-                title = title_map.get(code, "")
+        prereq_titles = pathway.get("prereq_titles", []) or []
+        if prereq_titles:
+            for i, row in enumerate(prereq_titles):
                 connector = "    " if i == 0 else "or  "
-                lines.append(f"{connector}{code} - {title or '[Title not available]'}")
+                lines.append(f"{connector}{row.get('code', '')} - {row.get('title') or '[Title not available]'}")
         else:
             lines.append("   ℹ️  No prerequisites found - this might be a foundational course!")
     lines.append("")
 
     lines.append("🎯 YOUR PREFERRED COURSE:")
-    lines.append("─" * 80)
+    lines.append(_RULE80)
     lines.append(f"   ➤  {course_code} - {course_title or '[Title not available]'}")
     lines.append("")
 
     lines.append("🚀 POSTREQUISITES (What you can study AFTER):")
-    lines.append("─" * 80)
-
-    postreq_paths = postreq_deps.get("postrequisite_paths", []) or []
-    valid_postreq_paths = [path for path in postreq_paths if path and len(path) > 1]
-
-    if valid_postreq_paths:
-        postreq_tree = {}
-        for path in valid_postreq_paths:
-            current = postreq_tree
-            for node in path[1:]:
-                code = node.get("code", "")
-                title = node.get("title", "")
-                display = f"{code} - {title or '[Title not available]'}"
-                current = current.setdefault(display, {})
-        render_tree(postreq_tree)
+    lines.append(_RULE80)
+
+    postreq_tree = pathway.get("postrequisite_tree") or []
+
+    if postreq_tree:
+        _render_tree(course_code, postreq_tree, lines)
     else:
-        search_query = """
-        MATCH (c:Course)
-        WHERE c.prereq_course_codes CONTAINS $course_code
-        RETURN c.course_code AS course_code, c.course_title AS title
-        LIMIT 50
-        """
-        dependent_courses = run_read_cypher(_drv, search_query, {"course_code": course_code}) or []
+        dependent_courses = pathway.get("dependents", []) or []
         if dependent_courses:
             for i, dep in enumerate(dependent_courses):
                 code = dep.get("course_code", "")
@@ -1120,9 +1338,9 @@ def build_full_pathway_tree(_drv, course_code: str) -> Optional[str]:
         else:
             lines.append("   ℹ️  No advanced courses found - this might be a terminal/capstone course!")
     lines.append("")
-    lines.append("=" * 80)
+    lines.append(_BAR80)
     lines.append("💡 TIP: Follow this pathway from top to bottom for optimal learning progression!")
-    lines.append("=" * 80)
+    lines.append(_BAR80)
 
     return "\n".join(lines)
 
@@ -1136,37 +1354,47 @@ def get_career_recommendations(username, _drv, database_name: str = None) -> Dic
         return {}
     
     try:
-        with driver.session(database=database_name or NEO4J_DATABASE) as s:
-            # Get user's RIASEC results and marks
-            result = s.run("""
-                MATCH (u:User {username: $username})
-                RETURN u.riasec_top3 AS top3,
-                       u.riasec_scores AS scores
-            """, username=username).single()
-            
-            if not result or not result['top3']:
-                return {}
-            
-            top3 = result['top3']
-            
-            # Get recommended courses based on RIASEC
-            cypher = """
-            MATCH (c:Course)
-            WHERE (c.R IN $top3 OR c.I IN $top3 OR c.A IN $top3 OR 
-                   c.S IN $top3 OR c.E IN $top3 OR c.C IN $top3)
-            RETURN c.course_code AS code,
-                   c.course_title AS title,
-                   c.recommended_semester AS semester,
-                   c.description AS description
-            LIMIT 10
-            """
-            
-            courses = s.run(cypher, top3=top3)
-            
-            return {
-                'top_traits': top3,
-                'recommended_courses': [dict(record) for record in courses]
+        # Trait nodes are unique on name, so courses are reached through an index seek.
+        # Until sync_course_traits.py has created them, rank on the course score properties.
+        record = driver.execute_query("""
+            MATCH (u:User {username: $username})
+            WITH u.riasec_top3 AS top3
+            WHERE size(coalesce(top3, [])) > 0
+            CALL {
+                WITH top3
+                CALL {
+                    WITH top3
+                    MATCH (t:Trait) WHERE t.name IN top3
+                    MATCH (c:Course)-[r:HAS_TRAIT]->(t)
+                    RETURN c, r.score AS score
+                    UNION ALL
+                    WITH top3
+                    WITH top3 WHERE NOT EXISTS { MATCH (:Trait) }
+                    MATCH (c:Course)
+                    UNWIND top3 AS trait
+                    WITH c, c[trait] AS score
+                    WHERE score > 0
+                    RETURN c, score
+                }
+                WITH c, sum(score) AS fit
+                ORDER BY fit DESC
+                LIMIT 10
+                RETURN collect({code: c.course_code,
+                                title: c.course_title,
+                                semester: c.recommended_semester,
+                                description: c.description}) AS recommended_courses
             }
+            RETURN top3, recommended_courses
+        """, username=username, database_=database_name or NEO4J_DATABASE,
+            routing_=RoutingControl.READ, result_transformer_=Result.single)
+
+        if not record:
+            return {}
+
+        return {
+            'top_traits': record['top3'],
+            'recommended_courses': record['recommended_courses']
+        }
     except Exception as e:
         print(f"Error getting career recommendations: {e}")
         return {}
@@ -1180,16 +1408,16 @@ def get_semester_courses(username, semester, _drv, database_name: str = None) ->
         with driver.session(database=database_name or NEO4J_DATABASE) as s:
             result = s.run("""
                 MATCH (u:User {username: $username})-[:HAS_PLAYLIST]->(p:Playlist)-[:CONTAINS]->(c:Course)
-                WHERE c.recommended_semester = $semester OR c.recommended_semester CONTAINS $sem_str
+                WHERE c.recommended_semester IN $sems
                 RETURN c.course_code AS course_code,
                        c.course_title AS course_title,
                        c.credits AS credits,
                        c.description AS description,
                        c.R AS R, c.I AS I, c.A AS A, c.S AS S, c.E AS E, c.C AS C
                 ORDER BY c.course_code
-            """, username=username, semester=int(semester), sem_str=str(semester))
+            """, username=username, sems=_semester_values(semester))
             
-            return [dict(record) for record in result]
+            return result.data()
     except Exception as e:
         print(f"Error getting semester courses: {e}")
         return []
@@ -1198,8 +1426,100 @@ def get_semester_courses(username, semester, _drv, database_name: str = None) ->
 # SEMANTIC SEARCH FUNCTIONS
 # ============================================================================
 
-def semantic_search_courses(_drv, query_text: str, top_k: int = 10) -> List[Dict[str, Any]]:
-    if not embedding_model:
+@lru_cache(maxsize=2048)
+def _encode_normalized(text: str) -> Tuple[np.ndarray, List[float]]:
+    vector = np.asarray(get_embedding_batcher().encode(text)).astype(np.float32, copy=False)
+    # Cached arrays are shared between callers, so freeze them
+    vector.setflags(write=False)
+    # The driver needs a list of floats; build it once per cached vector
+    return vector, vector.tolist()
+
+def _encode_query(text: str) -> Tuple[np.ndarray, List[float]]:
+    """Embed a query as (array, list), reusing results for case/whitespace-only repeats"""
+    return _encode_normalized(" ".join(text.lower().split()))
+
+class SemanticResultCache:
+    """FIFO cache of search results keyed by query embedding; near-duplicate queries hit.
+
+    Uses an hnswlib HNSW index when available, otherwise a brute-force matmul.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 512):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vectors = None
+        self._index = None
+        self._keys = [None] * max_entries
+        self._results = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _nearest(self, vector: np.ndarray):
+        """Yield (slot, similarity) candidates, most similar first where the backend allows"""
+        if self._index is not None:
+            labels, distances = self._index.knn_query(vector, k=min(4, self._size))
+            for label, distance in zip(labels[0], distances[0]):
+                yield int(label), 1.0 - float(distance)
+            return
+        # Embeddings are unit-length, so one matmul gives every cosine similarity
+        sims = self._vectors[:self._size] @ vector
+        for i in np.flatnonzero(sims >= self.threshold):
+            yield i, sims[i]
+
+    def get(self, vector: np.ndarray, key=None) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for the most similar stored query above threshold"""
+        with self._lock:
+            if not self._size:
+                return None
+            best, best_sim = None, self.threshold
+            for i, sim in self._nearest(vector):
+                if self._keys[i] == key and sim >= best_sim:
+                    best, best_sim = i, sim
+            return None if best is None else list(self._results[best])
+
+    def put(self, vector: np.ndarray, results: List[Dict[str, Any]], key=None):
+        """Store results, overwriting the oldest entry once full"""
+        with self._lock:
+            i = self._next
+            if hnswlib is not None:
+                if self._index is None:
+                    self._index = hnswlib.Index(space='cosine', dim=vector.shape[0])
+                    self._index.init_index(max_elements=self.max_entries, M=16, ef_construction=100)
+                # Slots are reused as labels; adding an existing label replaces its vector
+                self._index.add_items(vector[None, :], np.array([i]))
+            else:
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._vectors[i] = vector
+            self._keys[i] = key
+            self._results[i] = list(results)
+            self._next = (i + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def clear(self):
+        with self._lock:
+            self._size = self._next = 0
+            self._index = None
+
+# HNSW lookups stay sub-millisecond at sizes where the brute-force scan would not
+_SEMANTIC_CACHE_SIZE = 4096 if hnswlib is not None else 512
+_COURSE_RESULT_CACHE = SemanticResultCache(max_entries=_SEMANTIC_CACHE_SIZE)
+_JOB_RESULT_CACHE = SemanticResultCache(max_entries=_SEMANTIC_CACHE_SIZE)
+
+# Column order of the course search RETURN clauses below
+_COURSE_SEARCH_KEYS = (
+    'course_code', 'course_title', 'subject_area', 'credits', 'level', 'department',
+    'description', 'prereq_course_codes', 'R', 'I', 'A', 'S', 'E', 'C',
+    'recommended_semester', 'category', 'score'
+)
+
+_JOB_SEARCH_KEYS = ('job_id', 'job_title', 'skills_description', 'score', 'related_courses')
+
+def semantic_search_courses(_drv, query_text: str, top_k: int = 10,
+                            query_embedding: Tuple[np.ndarray, List[float]] = None) -> List[Dict[str, Any]]:
+    """Find courses by embedding similarity; pass an _encode_query() result to skip re-encoding"""
+    if not get_embedding_model():
         q = """
         MATCH (c:Course)
         WHERE toLower(c.course_title) CONTAINS toLower($q) OR toLower(c.course_code) CONTAINS toLower($q)
@@ -1212,15 +1532,19 @@ def semantic_search_courses(_drv, query_text: str, top_k: int = 10) -> List[Dict
                c.description AS description,
                c.prereq_course_codes AS prereq_course_codes,
                c.R AS R, c.I AS I, c.A AS A, c.S AS S, c.E AS E, c.C AS C,
-               c.course_riasec_vector AS course_riasec_vector,
                c.recommended_semester AS recommended_semester,
                c.category AS category,
                0.5 as score
         LIMIT $top_k
         """
-        return run_read_cypher(_drv, q, {"q": query_text, "top_k": top_k})
+        return run_read_cypher(_drv, q, {"q": query_text, "top_k": top_k}, keys=_COURSE_SEARCH_KEYS)
 
-    query_vector = embedding_model.encode(query_text, convert_to_numpy=True)
+    if query_embedding is None:
+        query_embedding = _encode_query(query_text)
+    query_vector, query_list = query_embedding
+    cached = _COURSE_RESULT_CACHE.get(query_vector, top_k)
+    if cached is not None:
+        return cached
 
     cypher = """
     CALL db.index.vector.queryNodes('course_embedding_index', $top_k, $query_vector) 
@@ -1235,7 +1559,6 @@ def semantic_search_courses(_drv, query_text: str, top_k: int = 10) -> List[Dict
            c.description AS description,
            c.prereq_course_codes AS prereq_course_codes,
            c.R AS R, c.I AS I, c.A AS A, c.S AS S, c.E AS E, c.C AS C,
-           c.course_riasec_vector AS course_riasec_vector,
            c.recommended_semester AS recommended_semester,
            c.category AS category,
            score
@@ -1243,19 +1566,29 @@ def semantic_search_courses(_drv, query_text: str, top_k: int = 10) -> List[Dict
     """
 
     try:
-        return run_read_cypher(_drv, cypher, {
-            'query_vector': query_vector.tolist(),
+        results = run_read_cypher(_drv, cypher, {
+            'query_vector': query_list,
             'top_k': top_k
-        })
+        }, keys=_COURSE_SEARCH_KEYS)
     except Exception as e:
         print(f"Semantic search error: {e}")
         return []
+    if results:
+        _COURSE_RESULT_CACHE.put(query_vector, results, top_k)
+    return results
 
-def semantic_search_jobs(_drv, query_text: str, top_k: int = 10) -> List[Dict[str, Any]]:
-    if not embedding_model:
+def semantic_search_jobs(_drv, query_text: str, top_k: int = 10,
+                         query_embedding: Tuple[np.ndarray, List[float]] = None) -> List[Dict[str, Any]]:
+    """Find jobs by embedding similarity; pass an _encode_query() result to skip re-encoding"""
+    if not get_embedding_model():
         return []
 
-    query_vector = embedding_model.encode(query_text, convert_to_numpy=True)
+    if query_embedding is None:
+        query_embedding = _encode_query(query_text)
+    query_vector, query_list = query_embedding
+    cached = _JOB_RESULT_CACHE.get(query_vector, top_k)
+    if cached is not None:
+        return cached
 
     cypher = """
     CALL db.index.vector.queryNodes('job_embedding_index', $top_k, $query_vector) 
@@ -1271,33 +1604,40 @@ def semantic_search_jobs(_drv, query_text: str, top_k: int = 10) -> List[Dict[st
     """
 
     try:
-        return run_read_cypher(_drv, cypher, {
-            'query_vector': query_vector.tolist(),
+        results = run_read_cypher(_drv, cypher, {
+            'query_vector': query_list,
             'top_k': top_k
-        })
+        }, keys=_JOB_SEARCH_KEYS)
     except Exception as e:
         print(f"Job search error: {e}")
         return []
+    if results:
+        _JOB_RESULT_CACHE.put(query_vector, results, top_k)
+    return results
 
 # ============================================================================
 # CONVERSATION DETECTION
 # ============================================================================
 
+# All anchored casual forms in one alternation so a single match() decides.
+# (.) is the only capturing group, so the repeated-character branch can use \1.
+_CASUAL_COMBINED = re.compile(
+    r"^(?:hi|hello|hey+|hii+|sup|what's up"
+    r"|good (?:morning|afternoon|evening)"
+    r"|ok|okay|yes|no|yep|nope|sure|thanks|thank you"
+    r"|who are you|what are you|what can you do"
+    r"|.{1,2}"
+    r"|(.)\1{2,})$"
+)
+
+_GREETING_RE = re.compile(r'^(hi|hello|hey+|hii+)$')
+_WHATS_UP_RE = re.compile(r'^(what\'s up|sup)$')
+
 def detect_casual_conversation(user_input: str) -> bool:
     input_lower = user_input.lower().strip()
 
-    casual_patterns = [
-        r'^(hi|hello|hey+|hii+|sup|what\'s up)$',
-        r'^good (morning|afternoon|evening)$',
-        r'^(ok|okay|yes|no|yep|nope|sure|thanks|thank you)$',
-        r'^(who are you|what are you|what can you do)$',
-        r'^.{1,2}$',
-        r'^(.)\1{2,}$',
-    ]
-
-    for pattern in casual_patterns:
-        if re.match(pattern, input_lower):
-            return True
+    if _CASUAL_COMBINED.match(input_lower):
+        return True
 
     if len(input_lower) < 4:
         course_keywords = ['course', 'class', 'job', 'career', 'study', 'learn', 'degree']
@@ -1310,7 +1650,7 @@ def get_conversational_response(user_input: str, username: str = None) -> str:
     input_lower = user_input.lower().strip()
     greeting = f"Hi there" if not username else f"Hi {username}"
 
-    if re.match(r'^(hi|hello|hey+|hii+)$', input_lower):
+    if _GREETING_RE.match(input_lower):
         return f"""{greeting}!
 
 I'm your Jain University Course & Career Assistant. I'm here to help you explore:
@@ -1329,7 +1669,7 @@ What would you like to know about? You can ask me things like:
 
 How can I help you today?"""
 
-    elif re.match(r'^(what\'s up|sup)$', input_lower):
+    elif _WHATS_UP_RE.match(input_lower):
         return f"""Not much {username or 'there'}! Just here waiting to help Jain University students like you navigate their academic journey!
 
 I can help you discover courses, understand prerequisites, explore career opportunities, and plan your learning pathway.
@@ -1353,7 +1693,132 @@ What would you like to know about?"""
 # QUERY PROCESSING
 # ============================================================================
 
-def process_user_query(_drv, user_input: str, username: str = None) -> Dict[str, Any]:
+def _split_terms(terms):
+    """Split a term list into single-word tokens and substring-matched phrases.
+
+    Multi-word and hyphenated terms are phrases, since the tokenizer splits on
+    spaces and hyphens. Any phrase containing a shorter phrase of the same list
+    ("pre reqs" vs "pre req") can never change the result and is dropped.
+    """
+    def is_phrase(term):
+        return ' ' in term or '-' in term
+
+    phrases = list(dict.fromkeys(t for t in terms if is_phrase(t)))
+    return (frozenset(t for t in terms if not is_phrase(t)),
+            tuple(p for p in phrases if not any(q != p and q in p for q in phrases)))
+
+_JOB_WORDS, _JOB_PHRASES = _split_terms((
+    "job", "career", "work", "employment", "opportunity", "hire", "hiring",
+    "profession", "industry", "vacancy", "recruitment"
+))
+
+_PREREQ_WORDS, _PREREQ_PHRASES = _split_terms((
+    "prerequisite", "prereq", "pre-req", "pre-requisite", "dependency", "requirement",
+    "required before", "before taking", "needed before", "need to learn before",
+    "must complete before", "foundation for", "prepare for", "pre req", "pre reqs", "pre recs"
+))
+
+_POSTREQ_WORDS, _POSTREQ_PHRASES = _split_terms((
+    "postrequisite", "postreq", "post-req", "post-requisite", "leads to", "next", "after",
+    "can take after", "follow-up", "advanced course", "what comes after",
+    "continue with", "next step", "progress to", "post rec", "post recs", "post req", "post reqs"
+))
+
+# Marks job queries that also ask about courses (e.g. "jobs after AI courses")
+_COURSE_WORDS, _COURSE_PHRASES = _split_terms((
+    "course", "class", "subject", "module", "degree", "program", "programme"
+))
+
+_PATHWAY_WORDS, _PATHWAY_PHRASES = _split_terms((
+    "pathway", "learning path", "study path", "progression", "roadmap",
+    "journey", "complete path", "full path", "learning journey", "entire path",
+    "curriculum map", "flow", "syllabus flow", "track", "academic track"
+))
+
+_TOKEN_PUNCT = ".,!?;:'\"()[]{}"
+
+# "job/career" and "career-oriented" should still yield their words as tokens
+_TOKEN_SPLIT_RE = re.compile(r"[\s/\-]+")
+
+def _query_tokens(input_lower: str) -> set:
+    """Space/slash/hyphen-separated tokens stripped of punctuation, plus their singular form"""
+    tokens = {tok.strip(_TOKEN_PUNCT) for tok in _TOKEN_SPLIT_RE.split(input_lower)}
+    tokens.update([tok[:-1] for tok in tokens if tok.endswith('s')])
+    return tokens
+
+_TERM_GROUPS = (
+    ("job", _JOB_WORDS, _JOB_PHRASES),
+    ("prereq", _PREREQ_WORDS, _PREREQ_PHRASES),
+    ("postreq", _POSTREQ_WORDS, _POSTREQ_PHRASES),
+    ("pathway", _PATHWAY_WORDS, _PATHWAY_PHRASES),
+    ("course", _COURSE_WORDS, _COURSE_PHRASES),
+)
+
+_WORD_CATEGORY = {word: category for category, words, _ in _TERM_GROUPS for word in words}
+
+# Token prefixes that also count, so inflections match ("hired", "working", "afterwards")
+# without substring hits inside unrelated words ("network")
+_STEM_CATEGORY = (
+    ("work", "job"), ("hire", "job"),
+    ("before", "prereq"), ("require", "prereq"),
+    ("after", "postreq"),
+)
+
+def _build_phrase_automaton():
+    """One Aho-Corasick automaton over every phrase, valued by its category"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for category, _, phrases in _TERM_GROUPS:
+        for phrase in phrases:
+            automaton.add_word(phrase, category)
+    automaton.make_automaton()
+    return automaton
+
+_PHRASE_AUTOMATON = _build_phrase_automaton()
+
+def _classify_query(input_lower: str) -> set:
+    """Return the intent categories ('job', 'prereq', ...) whose terms occur in the query"""
+    tokens = _query_tokens(input_lower)
+    categories = {_WORD_CATEGORY[tok] for tok in tokens if tok in _WORD_CATEGORY}
+    categories.update(category for stem, category in _STEM_CATEGORY
+                      if category not in categories and any(tok.startswith(stem) for tok in tokens))
+    if _PHRASE_AUTOMATON is not None:
+        # Single linear pass over the text finds every phrase of every category
+        categories.update(category for _, category in _PHRASE_AUTOMATON.iter(input_lower))
+    else:
+        categories.update(category for category, _, phrases in _TERM_GROUPS
+                          if category not in categories and any(p in input_lower for p in phrases))
+    return categories
+
+_QUERY_COURSE_CODE_RE = re.compile(r'([A-Za-z]{2,}[-\s]?\d{2,3})', re.IGNORECASE)
+
+# Shared pool for the independent Neo4j/embedding round-trips of a single query
+_QUERY_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("QUERY_WORKERS", "8")),
+                                     thread_name_prefix="query")
+
+def _fetch_chat_profile(_drv, username: str) -> Dict[str, Any]:
+    """Load the user fields the response prompt needs in one read"""
+    # Scores are stored as JSON text, which Cypher can't index; the stored vector
+    # (R, I, A, S, E, C order) divided by its sum gives the same normalized scores
+    try:
+        record = _drv.execute_query("""
+            MATCH (u:User {username: $username})
+            WITH u, coalesce(u.riasec_vector, []) AS v
+            WITH u, v, reduce(total = 0.0, x IN v | total + x) AS total
+            RETURN CASE WHEN total > 0 AND size(v) = 6 THEN
+                       [trait IN coalesce(u.riasec_top3, []) |
+                        {trait: trait, score: v[{R: 0, I: 1, A: 2, S: 3, E: 4, C: 5}[trait]] / total}]
+                   ELSE [] END AS riasec_top3
+        """, username=username, database_=NEO4J_DATABASE,
+            routing_=RoutingControl.READ, result_transformer_=Result.single)
+        return record.data() if record else {}
+    except Exception as e:
+        print(f"Error loading chat profile: {e}")
+        return {}
+
+def process_user_query(_drv, user_input: str, username: str = None,
+                       load_profile: bool = False) -> Dict[str, Any]:
     """Process user query and determine appropriate search strategy"""
 
     if detect_casual_conversation(user_input):
@@ -1377,41 +1842,33 @@ def process_user_query(_drv, user_input: str, username: str = None) -> Dict[str,
         'specific_course': None
     }
 
-    course_codes = re.findall(r'([A-Za-z]{2,}[-\s]?\d{2,3})', user_input, re.IGNORECASE)
-
-    course_results = semantic_search_courses(_drv, user_input, top_k=10)
-    results['courses'] = course_results
-
-    job_terms = [
-        "job", "career", "work", "employment", "opportunity", "hire", "hiring",
-        "profession", "industry", "vacancy", "recruitment"
-    ]
+    course_codes = _QUERY_COURSE_CODE_RE.findall(user_input)
 
-    prereq_terms = [
-        "prerequisite", "prereq", "pre-req", "dependency", "requirement",
-        "required before", "before taking", "needed before", "need to learn before",
-        "must complete before", "foundation for", "prepare for", "pre req", "pre reqs", "pre recs"
-    ]
+    # The prompt's profile fields load alongside the searches, but only when a prompt will be built
+    profile_future = (_QUERY_EXECUTOR.submit(_fetch_chat_profile, _drv, username)
+                      if load_profile and username and _drv else None)
 
-    postreq_terms = [
-        "postrequisite", "postreq", "post-req", "leads to", "next", "after",
-        "can take after", "follow-up", "advanced course", "what comes after",
-        "continue with", "next step", "progress to", "post rec", "post recs", "post req", "post reqs"
-    ]
+    categories = _classify_query(input_lower)
+    is_job_query = "job" in categories
+    is_prereq_query = "prereq" in categories
+    is_postreq_query = "postreq" in categories
+    is_pathway_query = "pathway" in categories
+    results['query_intents'] = categories
 
-    pathway_terms = [
-        "pathway", "learning path", "study path", "progression", "roadmap",
-        "journey", "complete path", "full path", "learning journey", "entire path",
-        "curriculum map", "flow", "syllabus flow", "track", "academic track"
-    ]
+    # Job queries that never mention courses don't use course results; skip that search
+    job_branch = is_job_query and not is_pathway_query and not (
+        course_codes and (is_prereq_query or is_postreq_query))
+    needs_courses = not job_branch or "course" in categories
 
-    def contains_any(text: str, terms: list) -> bool:
-        return any(term in text for term in terms)
+    # Embed once; the course and job searches share the vector
+    query_embedding = _encode_query(user_input) if get_embedding_model() else None
 
-    is_job_query = contains_any(input_lower, job_terms)
-    is_prereq_query = contains_any(input_lower, prereq_terms)
-    is_postreq_query = contains_any(input_lower, postreq_terms)
-    is_pathway_query = contains_any(input_lower, pathway_terms)
+    # Both vector searches are independent round-trips: put them in flight together on
+    # the shared pool while this thread handles the branch below (e.g. building a tree)
+    course_future = (_QUERY_EXECUTOR.submit(semantic_search_courses, _drv, user_input, 10, query_embedding)
+                     if needs_courses else None)
+    job_future = (_QUERY_EXECUTOR.submit(semantic_search_jobs, _drv, user_input, 8, query_embedding)
+                  if job_branch else None)
 
     if is_pathway_query:
         results['search_type'] = 'full_pathway'
@@ -1420,8 +1877,8 @@ def process_user_query(_drv, user_input: str, username: str = None) -> Dict[str,
             main_course = course_codes[0].upper().replace(' ', '-')
             results['ascii_tree'] = build_full_pathway_tree(_drv, main_course)
             results['specific_course'] = main_course
-        elif course_results:
-            main_course = course_results[0]['course_code']
+        elif course_future.result():
+            main_course = course_future.result()[0]['course_code']
             results['ascii_tree'] = build_full_pathway_tree(_drv, main_course)
             results['specific_course'] = main_course
 
@@ -1433,12 +1890,11 @@ def process_user_query(_drv, user_input: str, username: str = None) -> Dict[str,
         results['specific_course'] = main_course
 
     elif is_job_query:
-        job_results = semantic_search_jobs(_drv, user_input, top_k=8)
-        results['jobs'] = job_results
         results['search_type'] = 'job_search'
 
     else:
         results['search_type'] = 'course_search'
+        course_results = course_future.result()
 
         if (is_prereq_query or is_postreq_query) and course_results:
             main_course = course_results[0]['course_code']
@@ -1450,23 +1906,47 @@ def process_user_query(_drv, user_input: str, username: str = None) -> Dict[str,
             main_course = course_results[0]['course_code']
             results['ascii_tree'] = build_dependency_tree(_drv, main_course, "prerequisites")
 
+    results['courses'] = course_future.result() if course_future else []
+    results['jobs'] = job_future.result() if job_future else []
+    if profile_future:
+        results['_user_profile'] = profile_future.result()
     return results
 
+# The title group starts and ends on a non-space and trailing spaces are consumed
+# outside it, so a plain backreference template replaces the strip() callback
+_BOLD_RE = re.compile(r"\b([A-Z]{2,4}-\d{2,3})[:\-]\s*([A-Za-z&](?:[A-Za-z& ]*[A-Za-z&])?) *")
+
 def format_course_bolding(text):
     """Automatically bolds course codes and titles"""
-    pattern = r"\b([A-Z]{2,4}-\d{2,3})[:\-]\s*([A-Za-z& ]+)"
-
-    def repl(match):
-        code = match.group(1).strip()
-        title = match.group(2).strip()
-        return f"**{code}: {title}**"
-
-    return re.sub(pattern, repl, text)
+    return _BOLD_RE.sub(r"**\1: \2**", text)
 
 # ============================================================================
 # RESPONSE GENERATION
 # ============================================================================
 
+# Static instructions come first and the per-user RIASEC line last, so every
+# request shares the longest possible prompt prefix (provider-side prompt caching)
+_SYSTEM_PROMPT_TEMPLATE = """You are an academic counselor for Jain University who is genuinely curious about students' interests and goals.
+
+INSTRUCTIONS:
+1. Use the provided context for personal information (user's name is in context)
+2. Reference conversation history for context about past topics
+3. Use recent messages for immediate conversation flow
+4. Only mention information that's explicitly in these sections
+5. If asked about something not in context, say "We haven't discussed that yet"
+6. Always personalize responses using the student's name when available
+
+CURIOSITY & ENGAGEMENT:
+- ALWAYS end your response with 1-2 curious questions
+- Ask about their interests, preferences, or experiences related to the topic
+- Address students by their name when you know it
+
+Keep responses 2-3 paragraphs, recommend relevant courses with full details, then ask engaging questions.
+
+RIASEC SCORES & CAREER FIT:
+- Use these to suggest aligned courses/careers when relevant
+- Student's top 3 personality traits: {TOP_K}"""
+
 def generate_response(query_results: Dict[str, Any], user_input: str, client,
                       conversation_history: List[Dict] = None,
                       reference_document: str = None,
@@ -1489,11 +1969,9 @@ def generate_response(query_results: Dict[str, Any], user_input: str, client,
     if not client:
         return generate_fallback_response(query_results, user_input)
 
-    memory = SlidingWindowMemory(recent_messages_count=6, max_context_tokens=1500)
-
     context = ""
     if conversation_history:
-        context = memory.build_context(conversation_history, user_input, client, username)
+        context = _chat_memory.build_context(conversation_history, user_input, client, username)
 
     # Format courses with ALL properties
     courses_info = ""
@@ -1515,42 +1993,16 @@ def generate_response(query_results: Dict[str, Any], user_input: str, client,
             jobs_info += "\n"
 
     formatted_top_k = "Not available"
-    if username and _drv:
-        try:
-            with _drv.session(database=database_name or NEO4J_DATABASE) as s:
-                result = s.run("""
-                    MATCH (u:User {username: $username})
-                    RETURN u.riasec_scores AS all_scores
-                """, username=username).single()
-
-                if result and result['all_scores']:
-                    riasec_scores = json.loads(result['all_scores'])
-                    top_k = sorted(riasec_scores.items(), key=lambda x: x[1], reverse=True)[:3]
-                    formatted_top_k = ", ".join([f"{trait}: {score * 100:.1f}%" for trait, score in top_k])
-        except Exception as e:
-            print(f"Error fetching RIASEC scores: {e}")
-            formatted_top_k = "Not available"
-
-    system_prompt = f"""You are an academic counselor for Jain University who is genuinely curious about students' interests and goals.
-
-INSTRUCTIONS:
-1. Use the provided context for personal information (user's name is in context)
-2. Reference conversation history for context about past topics
-3. Use recent messages for immediate conversation flow
-4. Only mention information that's explicitly in these sections
-5. If asked about something not in context, say "We haven't discussed that yet"
-6. Always personalize responses using the student's name when available
-
-CURIOSITY & ENGAGEMENT:
-- ALWAYS end your response with 1-2 curious questions
-- Ask about their interests, preferences, or experiences related to the topic
-- Address students by their name when you know it
-
-RIASEC SCORES & CAREER FIT:
-- Student's top 3 personality traits: {formatted_top_k}
-- Use these to suggest aligned courses/careers when relevant
+    # process_user_query already loaded the profile; only fetch when called without it
+    user_profile = query_results.get('_user_profile')
+    if user_profile is None and username and _drv:
+        user_profile = _fetch_chat_profile(_drv, username)
+    if user_profile and user_profile.get('riasec_top3'):
+        formatted_top_k = ", ".join(
+            f"{row['trait']}: {row['score'] * 100:.1f}%" for row in user_profile['riasec_top3']
+        )
 
-Keep responses 2-3 paragraphs, recommend relevant courses with full details, then ask engaging questions."""
+    system_prompt = _SYSTEM_PROMPT_TEMPLATE.replace('{TOP_K}', formatted_top_k)
 
     full_context = []
     if context:
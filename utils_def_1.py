@@ -4,18 +4,19 @@ Date: 19th September 2025
 Core definition/configuration module for the project.
 """
 
+import contextlib
 import os
 import pathlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+import numpy as np
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from neo4j import GraphDatabase, basic_auth
 
-# Used for embeddings
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError:
-    SentenceTransformer = None
-
 # Try import mistralai
 try:
     from mistralai import Mistral
@@ -36,6 +37,12 @@ NEO4J_USER = os.getenv("NEO4J_USER") or os.getenv("NEO4J_USERNAME")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
 
+# Connection pool tuning: fail fast on a saturated pool, recycle connections hourly
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "5.0"))
+NEO4J_CONNECTION_LIFETIME = float(os.getenv("NEO4J_CONNECTION_LIFETIME", "3600"))
+NEO4J_CONNECTION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "5.0"))
+
 # Getting the API keys for the LLM (Mistral)
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
@@ -44,25 +51,233 @@ MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
 EMBED_MODEL_NAME = os.getenv("HUGGINGFACE_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 EMBED_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
 
-# Initialize embedding model
-try:
-    if SentenceTransformer:
-        embedding_model = SentenceTransformer(EMBED_MODEL_NAME)
-    else:
-        embedding_model = None
-except Exception as e:
-    print(f"Failed to load embedding model: {e}")
-    embedding_model = None
+# Skip loading torch/the encoder entirely (CI, scripts); searches fall back to text matching
+DISABLE_EMBEDDINGS = os.getenv("DISABLE_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+USE_ONNX = os.getenv("USE_ONNX", "false").lower() in ("1", "true", "yes")
+ONNX_CACHE_DIR = pathlib.Path(os.getenv("ONNX_CACHE_DIR", str(project_root / ".onnx_models")))
+
+class OnnxEmbedder:
+    """int8-quantized ONNX Runtime encoder with a SentenceTransformer-style encode()"""
+
+    def __init__(self, model, tokenizer, max_length: int = 256):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+
+    def encode(self, texts, batch_size: int = 32, normalize_embeddings: bool = True,
+               convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_length, return_tensors="np"
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            # Mean pooling over real tokens, as sentence-transformers does
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            chunks.append(pooled.astype(np.float32, copy=False))
+        vectors = np.concatenate(chunks)
+        return vectors[0] if single else vectors
+
+def load_onnx_embedder(model_name: str) -> OnnxEmbedder:
+    """Export and dynamically quantize the model on first use, then load the cached int8 copy"""
+    # Optional int8 ONNX Runtime embeddings (pip install "optimum[onnxruntime]")
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    onnx_dir = ONNX_CACHE_DIR / model_name.replace("/", "__")
+    quantized_file = "model_quantized.onnx"
+    if not (onnx_dir / quantized_file).exists():
+        exported = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        exported.save_pretrained(onnx_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(onnx_dir)
+        # Dynamic int8 quantization targeting VNNI dot-product instructions
+        quantizer = ORTQuantizer.from_pretrained(onnx_dir)
+        quantizer.quantize(
+            save_dir=onnx_dir,
+            quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        )
+    model = ORTModelForFeatureExtraction.from_pretrained(onnx_dir, file_name=quantized_file)
+    return OnnxEmbedder(model, AutoTokenizer.from_pretrained(onnx_dir))
+
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "4"))
+
+def _inference_context():
+    """torch.inference_mode() when torch is present; grad mode is per-thread, so enter it around each encode"""
+    try:
+        import torch
+    except ImportError:
+        return contextlib.nullcontext()
+    return torch.inference_mode()
+
+def warm_up_embedding_model(model):
+    """Run one throwaway encode so the first user query doesn't pay tokenizer/kernel init"""
+    try:
+        tokenizer = getattr(model, "tokenizer", None)
+        if tokenizer is not None:
+            tokenizer("warmup")
+        with _inference_context():
+            model.encode(["warmup"], convert_to_numpy=True)
+    except Exception as e:
+        print(f"Embedding warm-up failed: {e}")
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """Load, tune and warm up the embedding model on first use (None if disabled/unavailable)"""
+    if DISABLE_EMBEDDINGS:
+        return None
+
+    # Single-query encodes are tiny; a few threads beat one per core
+    try:
+        import torch
+        torch.set_num_threads(TORCH_NUM_THREADS)
+    except ImportError:
+        pass
+
+    model = None
+    if USE_ONNX:
+        try:
+            model = load_onnx_embedder(EMBED_MODEL_NAME)
+        except ImportError:
+            print("USE_ONNX is set but optimum[onnxruntime] is not installed")
+        except Exception as e:
+            print(f"Failed to load ONNX embedding model, using SentenceTransformer: {e}")
+    if model is None:
+        try:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(EMBED_MODEL_NAME)
+            model.eval()
+        except ImportError:
+            return None
+        except Exception as e:
+            print(f"Failed to load embedding model: {e}")
+            return None
+
+    warm_up_embedding_model(model)
+    return model
+
+# Embedding micro-batching config
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "20"))
+
+class EmbeddingBatcher:
+    """Collects concurrent encode requests into one batched forward pass"""
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 20):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for encoding; the future resolves to its vector"""
+        future = Future()
+        self._queue.put((text, future))
+        self._ensure_worker()
+        return future
+
+    def encode(self, text: str, timeout: float = None):
+        """Encode a single text through the shared batch worker"""
+        return self.submit(text).result(timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                # Encoding happens on this worker thread, so autograd is disabled here
+                with _inference_context():
+                    vectors = self.model.encode(
+                        texts, batch_size=self.max_batch_size,
+                        normalize_embeddings=True, convert_to_numpy=True
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+@lru_cache(maxsize=1)
+def get_embedding_batcher():
+    """Shared batcher over the lazily loaded model (None without a model)"""
+    model = get_embedding_model()
+    return EmbeddingBatcher(model, EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_MS) if model else None
+
+# Indexes/constraints backing the hot lookup predicates
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT user_username IF NOT EXISTS FOR (u:User) REQUIRE u.username IS UNIQUE",
+    "CREATE INDEX mark_id IF NOT EXISTS FOR (m:Mark) ON (m.id)",
+    "CREATE INDEX chat_message_timestamp IF NOT EXISTS FOR (m:ChatMessage) ON (m.timestamp)",
+    "CREATE INDEX course_code IF NOT EXISTS FOR (c:Course) ON (c.course_code)",
+    "CREATE INDEX course_sem IF NOT EXISTS FOR (c:Course) ON (c.recommended_semester)",
+    "CREATE CONSTRAINT trait_name IF NOT EXISTS FOR (t:Trait) REQUIRE t.name IS UNIQUE",
+]
+
+_schema_ready = False
+
+def ensure_schema(drv):
+    """Create missing indexes/constraints once per process"""
+    global _schema_ready
+    if _schema_ready or drv is None:
+        return
+    with drv.session(database=NEO4J_DATABASE) as s:
+        for statement in SCHEMA_STATEMENTS:
+            try:
+                s.run(statement).consume()
+            except Exception as e:
+                print(f"Schema setup skipped ({statement}): {e}")
+    _schema_ready = True
 
 # Neo4j Driver
 driver = None
 neo4j_error = None
 if NEO4J_URI and NEO4J_USER and NEO4J_PASSWORD:
     try:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=basic_auth(NEO4J_USER, NEO4J_PASSWORD))
+        driver = GraphDatabase.driver(
+            NEO4J_URI, auth=basic_auth(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=NEO4J_POOL_SIZE,
+            connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+            max_connection_lifetime=NEO4J_CONNECTION_LIFETIME,
+            connection_timeout=NEO4J_CONNECTION_TIMEOUT,
+            keep_alive=True
+        )
         # Test connection
         with driver.session(database=NEO4J_DATABASE) as s:
             s.run("RETURN 1").single()
+        ensure_schema(driver)
     except Exception as e:
         neo4j_error = str(e)
         driver = None
@@ -70,11 +285,15 @@ else:
     neo4j_error = "NEO4J credentials missing"
 
 # Helper Function: Neo4j Read
-def run_read_cypher(drv, query: str, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+def run_read_cypher(drv, query: str, params: Dict[str, Any] = None,
+                    keys: Tuple[str, ...] = None) -> List[Dict[str, Any]]:
+    """Run a read query; pass keys (the RETURN column order) to skip per-record data() conversion"""
     params = params or {}
     try:
         with drv.session(database=NEO4J_DATABASE) as s:
             res = s.run(query, params)
+            if keys:
+                return [dict(zip(keys, r.values())) for r in res]
             return [r.data() for r in res]
     except Exception as e:
         print(f"Neo4j query error: {e}")